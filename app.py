@@ -1,16 +1,39 @@
 import os
+import functools
+import hmac
+import json
 import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from flask import Flask, jsonify, render_template
+from urllib.parse import urlsplit
+from flask import Flask, Response, abort, g, jsonify, render_template, request, stream_with_context
 from flask_cors import CORS
+from jinja2 import ChoiceLoader, ModuleLoader
 from dotenv import load_dotenv
 import requests
 
+from cache import create_cache_from_env
+from changefeed import LeaderLock, MemoryFeed, Poller, SQLiteFeed
+from comments import CommentTreeFetcher, ItemCache
+from instrumentation import (
+    LATENCY_BUCKETS,
+    SIZE_BUCKETS,
+    Metrics,
+    RequestProfiler,
+    configure_logging,
+)
+from payloads import PayloadCache, PreparedPayload, payload_response
+from upstream import create_client_from_env
+
 # Load environment variables from a .env file if present
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging from LOG_LEVEL and LOG_FORMAT
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Create the Flask app
 app = Flask(__name__)
@@ -19,37 +42,544 @@ app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 # Enable CORS for all routes
 CORS(app)
 
+# Templates and the front page snapshot written by build.py, if present
+BUILD_DIR = os.environ.get("HN_BUILD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "build"))
+COMPILED_TEMPLATES_DIR = os.path.join(BUILD_DIR, "templates")
+SNAPSHOT_PATH = os.path.join(BUILD_DIR, "front_page.json")
+# Oldest build snapshot a cold instance will serve while it refreshes
+SNAPSHOT_MAX_AGE = float(os.environ.get("HN_SNAPSHOT_MAX_AGE", str(7 * 86400)))
+# Opt-in, since compiled templates do not see later edits to templates/
+USE_COMPILED_TEMPLATES = os.environ.get("HN_USE_COMPILED_TEMPLATES", "0") == "1"
+
+
+def _use_compiled_templates(flask_app, directory):
+    """Load templates precompiled by build.py, falling back to the source files"""
+    # Flask's default loader needs template source, which ModuleLoader cannot
+    # provide, so the compiled loader must be the environment's own loader
+    flask_app.jinja_options = {
+        **flask_app.jinja_options,
+        "loader": ChoiceLoader([ModuleLoader(directory), flask_app.create_global_jinja_loader()]),
+    }
+
+
+if USE_COMPILED_TEMPLATES:
+    if os.path.isdir(COMPILED_TEMPLATES_DIR):
+        _use_compiled_templates(app, COMPILED_TEMPLATES_DIR)
+    else:
+        logger.warning("HN_USE_COMPILED_TEMPLATES is set but %s does not exist", COMPILED_TEMPLATES_DIR)
+
+# Local story store: SQLite by default, Postgres through DATABASE_URL.
+# SQLAlchemy is imported on first use since it dominates import time.
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+_store = None
+_store_lock = threading.Lock()
+
+
+@app.teardown_appcontext
+def _remove_store_session(error):
+    if _store is not None:
+        _store.Session.remove()
+
 # Hacker News API configuration
-HN_API_URL = "https://hn.algolia.com/api/v1/search"
+HN_API_URL = os.environ.get("HN_API_URL", "https://hn.algolia.com/api/v1/search")
+
+# Pooled client for outbound calls, configured through HN_HTTP_* variables
+upstream = create_client_from_env()
 
+# Metrics for /api/metrics; set HN_METRICS_DIR to sum them across gunicorn workers
+metrics = Metrics(directory=os.environ.get("HN_METRICS_DIR"))
+metrics.describe("http_requests_total", "counter", "HTTP requests by route, method and status")
+metrics.describe(
+    "http_request_duration_seconds", "histogram",
+    "Time to produce response headers, by route and method", LATENCY_BUCKETS,
+)
+metrics.describe(
+    "http_response_size_bytes", "histogram",
+    "Response body size for non-streamed responses, by route", SIZE_BUCKETS,
+)
+metrics.describe("http_requests_in_flight", "gauge", "Requests currently being served")
+metrics.describe("upstream_requests_total", "counter", "Upstream HTTP attempts by host and outcome")
+metrics.describe(
+    "upstream_request_duration_seconds", "histogram",
+    "Upstream HTTP attempt latency by host", LATENCY_BUCKETS,
+)
+metrics.describe("hn_cache_events_total", "counter", "Front page cache lookups by result")
+metrics.describe(
+    "hn_fetch_duration_seconds", "histogram",
+    "Time spent in _fetch_hacker_news, including retries, by outcome", LATENCY_BUCKETS,
+)
 
-def _fetch_hacker_news():
-    """Fetch front page Hacker News stories"""
-    params = {"tags": "front_page"}
-    response = requests.get(HN_API_URL, params=params, timeout=10)
-    response.raise_for_status()
-    data = response.json()
+# Opt-in profiling: ?profile=1 with a matching X-Profile-Token header, or a sampled fraction
+HN_PROFILE_TOKEN = os.environ.get("HN_PROFILE_TOKEN")
+HN_PROFILE_SAMPLE_RATE = float(os.environ.get("HN_PROFILE_SAMPLE_RATE", "0"))
 
-    def format_date(date_str: str) -> str:
-        if not date_str:
-            return ""
+
+def _observe_upstream(url, outcome, seconds):
+    host = urlsplit(url).netloc
+    metrics.inc("upstream_requests_total", {"host": host, "outcome": outcome})
+    metrics.observe("upstream_request_duration_seconds", seconds, {"host": host})
+
+
+upstream.observer = _observe_upstream
+
+
+def _timed_fetch(func):
+    """Record the duration and outcome of each call to ``func``"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
-            return dt.strftime("%Y-%m-%d %H:%M UTC")
-        except ValueError:
-            return date_str
-
-    articles = [
-        {
-            "title": h.get("title") or h.get("story_title"),
-            "url": h.get("url") or h.get("story_url"),
-            "author": h.get("author"),
-            "points": h.get("points"),
-            "created_at": format_date(h.get("created_at")),
-        }
-        for h in data.get("hits", [])
-    ]
-    return articles
+            result = func(*args, **kwargs)
+            outcome = "success"
+            return result
+        finally:
+            metrics.observe(
+                "hn_fetch_duration_seconds", time.perf_counter() - started, {"outcome": outcome}
+            )
+    return wrapper
+
+# Shared cache for the front page, configured through HN_CACHE_* variables
+front_page_cache = create_cache_from_env()
+
+
+def _observe_cache(result):
+    metrics.inc("hn_cache_events_total", {"result": result})
+
+
+front_page_cache.observer = _observe_cache
+
+# Serialized and compressed JSON bodies, keyed by content version
+payload_cache = PayloadCache()
+_health_payload = None
+
+
+# Default Algolia query: a single page of the front page
+DEFAULT_QUERY = {"tags": "front_page"}
+
+# Limits for multi-page requests to /api/hacker-news
+MAX_PAGES = 10
+MAX_HITS_PER_PAGE = 1000
+
+# Bounded pool used to fetch pages concurrently
+page_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("HN_PAGE_FETCH_WORKERS", "4")),
+    thread_name_prefix="hn-page",
+)
+
+
+def _format_date(date_str: str) -> str:
+    if not date_str:
+        return ""
+    try:
+        dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+        return dt.strftime("%Y-%m-%d %H:%M UTC")
+    except ValueError:
+        return date_str
+
+
+def _format_article(h):
+    return {
+        "title": h.get("title") or h.get("story_title"),
+        "url": h.get("url") or h.get("story_url"),
+        "author": h.get("author"),
+        "points": h.get("points"),
+        "created_at": _format_date(h.get("created_at")),
+    }
+
+
+def _fetch_page(params, page=0):
+    """Fetch and format a single page of Algolia search hits"""
+    if page:
+        params = {**params, "page": page}
+    data = upstream.get_json(HN_API_URL, params=params)
+    return [_format_article(h) for h in data.get("hits", [])]
+
+
+@_timed_fetch
+def _fetch_hacker_news(params=None, pages=1):
+    """Fetch Hacker News stories, front page by default"""
+    params = params or DEFAULT_QUERY
+    if pages == 1:
+        return _fetch_page(params)
+
+    futures = [page_pool.submit(_fetch_page, params, page) for page in range(pages)]
+    return [article for future in futures for article in future.result()]
+
+
+def _iter_hacker_news_pages(params, pages):
+    """Yield each page of formatted stories in page order, as soon as it is ready"""
+    futures = [page_pool.submit(_fetch_page, params, page) for page in range(pages)]
+    try:
+        # Pages are fetched concurrently; later pages that finish first wait here
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _articles_cache_key(params, pages):
+    return "search:" + json.dumps({"params": params, "pages": pages}, sort_keys=True)
+
+
+def _get_articles_entry(params=None, pages=1):
+    """Return ``(articles, stored_at)`` for an Algolia query through the shared cache"""
+    params = params or DEFAULT_QUERY
+    return front_page_cache.get_entry(
+        _articles_cache_key(params, pages), lambda: _fetch_hacker_news(params, pages)
+    )
+
+
+def _get_articles(params=None, pages=1):
+    """Return stories for an Algolia query through the shared cache"""
+    return _get_articles_entry(params, pages)[0]
+
+
+def _json_bytes(obj):
+    return app.json.dumps(obj).encode()
+
+
+def _articles_cache_control(stored_at):
+    """Let shared caches keep articles for as long as our own cache would"""
+    age = time.time() - stored_at
+    if age >= front_page_cache.ttl + front_page_cache.stale_ttl:
+        # A build snapshot or stale-if-error fallback: serve it, but don't let CDNs keep it
+        return "public, max-age=0"
+    max_age = max(0, int(front_page_cache.ttl - age))
+    return (
+        f"public, max-age={max_age}, "
+        f"stale-while-revalidate={int(front_page_cache.stale_ttl)}, "
+        f"stale-if-error={int(front_page_cache.stale_if_error)}"
+    )
+
+
+def _load_snapshot():
+    """Seed the cache with the build-time front page so a cold instance can serve it.
+
+    The first requests serve the snapshot, however old, while a background
+    refresh replaces it. Snapshots older than HN_SNAPSHOT_MAX_AGE are
+    ignored. The entry keeps its real age, so it is never advertised to
+    shared caches as fresh.
+    """
+    if not os.path.exists(SNAPSHOT_PATH):
+        return
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            snapshot = json.load(f)
+        articles, fetched_at = snapshot["articles"], float(snapshot["fetched_at"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Ignoring front page snapshot %s: %s", SNAPSHOT_PATH, e)
+        return
+    if time.time() - fetched_at >= SNAPSHOT_MAX_AGE:
+        logger.info("Ignoring front page snapshot %s older than HN_SNAPSHOT_MAX_AGE", SNAPSHOT_PATH)
+        return
+
+    key = _articles_cache_key(DEFAULT_QUERY, 1)
+    entry = front_page_cache.backend.get(key)
+    # A shared backend may already hold this snapshot from another worker
+    if entry is not None and entry[1] != fetched_at:
+        return
+    front_page_cache.seed(key, articles, fetched_at, SNAPSHOT_MAX_AGE)
+
+
+_load_snapshot()
+
+
+def _parse_int_arg(name, default=None, minimum=None, maximum=None):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        abort(400)
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        abort(400)
+    return value
+
+
+def _parse_search_args():
+    """Build Algolia search params and a page count from the query string"""
+    params = {"tags": request.args.get("tags", DEFAULT_QUERY["tags"])}
+
+    hits_per_page = _parse_int_arg("hitsPerPage", minimum=1, maximum=MAX_HITS_PER_PAGE)
+    if hits_per_page is not None:
+        params["hitsPerPage"] = hits_per_page
+
+    numeric_filters = []
+    if request.args.get("numericFilters"):
+        numeric_filters.append(request.args["numericFilters"])
+    created_after = _parse_int_arg("created_after", minimum=0)
+    if created_after is not None:
+        numeric_filters.append(f"created_at_i>{created_after}")
+    created_before = _parse_int_arg("created_before", minimum=0)
+    if created_before is not None:
+        numeric_filters.append(f"created_at_i<{created_before}")
+    if numeric_filters:
+        params["numericFilters"] = ",".join(numeric_filters)
+
+    pages = _parse_int_arg("pages", default=1, minimum=1, maximum=MAX_PAGES)
+    return params, pages
+
+
+def _stream_articles_ndjson(params, pages):
+    try:
+        for articles in _iter_hacker_news_pages(params, pages):
+            for article in articles:
+                yield json.dumps(article) + "\n"
+    except requests.RequestException as e:
+        logging.error(f"Error streaming Hacker News: {str(e)}")
+        yield json.dumps({"error": "Bad Gateway", "message": "Failed to fetch Hacker News"}) + "\n"
+
+
+# Incremental story sync configuration
+HN_SYNC_URL = os.environ.get("HN_SYNC_URL", "https://hn.algolia.com/api/v1/search_by_date")
+HN_SYNC_TAGS = os.environ.get("HN_SYNC_TAGS", "story")
+HN_SYNC_MAX_PAGES = int(os.environ.get("HN_SYNC_MAX_PAGES", "10"))
+
+# Page size limit for /api/stories
+MAX_STORIES_LIMIT = 200
+
+
+def _get_store():
+    """Import the story store and create its tables on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                import store
+
+                database_url = DATABASE_URL
+                if database_url is None:
+                    os.makedirs(app.instance_path, exist_ok=True)
+                    database_url = "sqlite:///" + os.path.join(app.instance_path, "stories.db")
+                store.init_store(database_url)
+                _store = store
+    return _store
+
+
+def _sync_stories():
+    return _get_store().sync_stories(
+        lambda params: upstream.get_json(HN_SYNC_URL, params=params),
+        tags=HN_SYNC_TAGS,
+        max_pages=HN_SYNC_MAX_PAGES,
+    )
+
+
+@app.cli.command("sync-stories")
+def sync_stories_command():
+    """Pull new stories from Algolia into the local story store"""
+    written = _sync_stories()
+    print(f"Synced {written} stories")
+
+
+# Comment trees from the Algolia items API
+HN_ITEMS_URL = os.environ.get("HN_ITEMS_URL", "https://hn.algolia.com/api/v1/items")
+MAX_COMMENT_DEPTH = 50
+MAX_COMMENTS = 5000
+
+comment_fetcher = CommentTreeFetcher(
+    lambda item_id: upstream.get_json(f"{HN_ITEMS_URL}/{item_id}"),
+    _format_date,
+    cache=ItemCache(
+        maxsize=int(os.environ.get("HN_ITEM_CACHE_SIZE", "5000")),
+        ttl=float(os.environ.get("HN_ITEM_CACHE_TTL", "60")),
+    ),
+    max_workers=int(os.environ.get("HN_COMMENT_FETCH_WORKERS", "8")),
+)
+
+
+def _format_story_item(item):
+    return {
+        "id": item.get("id"),
+        "title": item.get("title"),
+        "url": item.get("url"),
+        "author": item.get("author"),
+        "points": item.get("points"),
+        "created_at": _format_date(item.get("created_at")),
+    }
+
+
+def _stream_comments_ndjson(story, max_depth, max_comments):
+    yield json.dumps({"type": "story", **_format_story_item(story)}) + "\n"
+    walk = comment_fetcher.walk(story, max_depth, max_comments)
+    count = 0
+    try:
+        for comment in walk:
+            count += 1
+            yield json.dumps({"type": "comment", **comment}) + "\n"
+    except requests.RequestException as e:
+        logging.error(f"Error streaming comments: {str(e)}")
+        yield json.dumps({"type": "error", "error": "Bad Gateway", "message": "Failed to fetch comments"}) + "\n"
+        return
+    yield json.dumps({"type": "end", "count": count, "truncated": walk.truncated}) + "\n"
+
+
+# Background poller and change feed, configured through HN_POLLER_* / HN_FEED_*
+HN_POLLER_ENABLED = os.environ.get("HN_POLLER_ENABLED", "0") == "1"
+HN_POLLER_INTERVAL = float(os.environ.get("HN_POLLER_INTERVAL", "30"))
+# The poller must run once per host, which only a shared feed allows, so it defaults to SQLite
+HN_FEED_BACKEND = os.environ.get("HN_FEED_BACKEND", "sqlite" if HN_POLLER_ENABLED else "memory")
+
+# Upper bounds for long-poll waits and the lifetime of one SSE connection
+MAX_LONG_POLL_TIMEOUT = 60
+SSE_KEEPALIVE_INTERVAL = 15
+SSE_MAX_DURATION = float(os.environ.get("HN_SSE_MAX_DURATION", "300"))
+
+
+def _create_feed():
+    retention = int(os.environ.get("HN_FEED_RETENTION", "1000"))
+    if HN_FEED_BACKEND == "sqlite":
+        return SQLiteFeed(os.environ.get("HN_FEED_PATH", "hn_feed.sqlite3"), retention=retention)
+    if HN_FEED_BACKEND == "memory":
+        return MemoryFeed(retention=retention)
+    raise ValueError(f"Unknown HN_FEED_BACKEND: {HN_FEED_BACKEND}")
+
+
+change_feed = _create_feed()
+poller = None
+_poller_lock = threading.Lock()
+
+
+def _fetch_front_page_with_ids():
+    data = upstream.get_json(HN_API_URL, params=DEFAULT_QUERY)
+    return [{"id": h.get("objectID"), **_format_article(h)} for h in data.get("hits", [])]
+
+
+def _warm_front_page_cache(articles):
+    front_page_cache.set(
+        _articles_cache_key(DEFAULT_QUERY, 1),
+        [{k: v for k, v in a.items() if k != "id"} for a in articles],
+    )
+
+
+@app.before_request
+def _start_poller():
+    """Start the poller in each worker on its first request, after any fork"""
+    global poller
+    if not HN_POLLER_ENABLED or poller is not None:
+        return
+    with _poller_lock:
+        if poller is None:
+            # A memory feed (only for single-worker servers) is private to this
+            # process, so it needs its own poller
+            lock = None
+            if HN_FEED_BACKEND != "memory":
+                lock = LeaderLock(os.environ.get("HN_POLLER_LOCK_PATH", "/tmp/hn_poller.lock"))
+            poller = Poller(
+                _fetch_front_page_with_ids,
+                change_feed,
+                interval=HN_POLLER_INTERVAL,
+                lock=lock,
+                on_refresh=_warm_front_page_cache,
+            )
+            poller.start()
+
+
+def _feed_cursor(version):
+    # Versions are only meaningful within one feed; a memory feed restarts at 1 in every worker
+    return f"{change_feed.epoch}-{version}"
+
+
+def _parse_feed_cursor(cursor):
+    """Return the version in ``cursor``, or None if it is missing or from another feed"""
+    epoch, _, version = (cursor or "").rpartition("-")
+    if epoch != change_feed.epoch or not version.isdigit():
+        return None
+    return int(version)
+
+
+def _feed_event(event):
+    return {**event, "version": _feed_cursor(event["version"])}
+
+
+def _sse_message(event, version, data):
+    return f"event: {event}\nid: {_feed_cursor(version)}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_snapshot():
+    version, articles = change_feed.snapshot()
+    return version, _sse_message("snapshot", version, {"version": _feed_cursor(version), "data": articles})
+
+
+def _stream_change_events(since):
+    deadline = time.monotonic() + SSE_MAX_DURATION
+    version = since
+    if version is None:
+        version, message = _sse_snapshot()
+        yield message
+
+    while time.monotonic() < deadline:
+        events = change_feed.wait_for_events(version, SSE_KEEPALIVE_INTERVAL)
+        if events is None:
+            version, message = _sse_snapshot()
+            yield message
+        elif events:
+            for event in events:
+                version = event["version"]
+                yield _sse_message("diff", version, _feed_event(event))
+        else:
+            yield ": keepalive\n\n"
+
+
+def _profile_requested():
+    if request.args.get("profile") != "1" or not HN_PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get("X-Profile-Token", ""), HN_PROFILE_TOKEN)
+
+
+@app.before_request
+def _start_request_metrics():
+    metrics.start_writer()
+    g.request_started = time.perf_counter()
+    g.in_flight = True
+    metrics.gauge_add("http_requests_in_flight")
+
+    explicit = _profile_requested()
+    if explicit or (HN_PROFILE_SAMPLE_RATE and random.random() < HN_PROFILE_SAMPLE_RATE):
+        profiler = RequestProfiler()
+        if profiler.start():
+            g.profiler = profiler
+            g.profile_explicit = explicit
+
+
+@app.after_request
+def _record_request_metrics(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        stats = profiler.stop()
+        if g.profile_explicit:
+            status = response.status_code
+            response = Response(stats, mimetype="text/plain")
+            response.headers["X-Profiled-Status"] = str(status)
+        else:
+            logger.info("Sampled profile for %s %s\n%s", request.method, request.path, stats)
+
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    duration = time.perf_counter() - g.get("request_started", time.perf_counter())
+    metrics.inc("http_requests_total", {
+        "route": route, "method": request.method, "status": str(response.status_code),
+    })
+    metrics.observe("http_request_duration_seconds", duration, {"route": route, "method": request.method})
+    if not response.is_streamed and response.content_length is not None:
+        metrics.observe("http_response_size_bytes", response.content_length, {"route": route})
+    logger.debug("request handled", extra={
+        "route": route,
+        "method": request.method,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+    })
+    return response
+
+
+@app.teardown_request
+def _finish_request_metrics(error):
+    # Streamed responses tear down once the stream ends, so they count as in flight until then
+    if g.pop("in_flight", False):
+        metrics.gauge_add("http_requests_in_flight", value=-1)
 
 
 # Error handler for 404
@@ -92,18 +622,29 @@ def documentation():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "message": "API is running successfully",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-    })
+    global _health_payload
+    # The body only changes once per second, so serialize it at most that often
+    second = int(time.time())
+    if _health_payload is None or _health_payload[0] != second:
+        _health_payload = (second, PreparedPayload(_json_bytes({
+            "status": "healthy",
+            "message": "API is running successfully",
+            "timestamp": datetime.fromtimestamp(second, timezone.utc).isoformat(),
+        })))
+    return payload_response(_health_payload[1], "no-cache")
 
 @app.route('/api/hacker-news', methods=['GET'])
 def hacker_news_api():
     """Fetch the latest Hacker News stories as JSON"""
+    params, pages = _parse_search_args()
+    if request.args.get("stream") == "ndjson":
+        return Response(
+            stream_with_context(_stream_articles_ndjson(params, pages)),
+            mimetype="application/x-ndjson",
+        )
+
     try:
-        articles = _fetch_hacker_news()
-        return jsonify({"status": "success", "count": len(articles), "data": articles})
+        articles, stored_at = _get_articles_entry(params, pages)
     except requests.RequestException as e:
         logging.error(f"Error fetching Hacker News: {str(e)}")
         return jsonify({
@@ -111,32 +652,159 @@ def hacker_news_api():
             "message": "Failed to fetch Hacker News",
         }), 502
 
+    payload = payload_cache.get(
+        ("articles", _articles_cache_key(params, pages), stored_at),
+        lambda: _json_bytes({"status": "success", "count": len(articles), "data": articles}),
+    )
+    return payload_response(payload, _articles_cache_control(stored_at))
+
+
+@app.route('/api/hacker-news/events', methods=['GET'])
+def hacker_news_events():
+    """Stream front page diffs as Server-Sent Events"""
+    since = _parse_feed_cursor(request.headers.get("Last-Event-ID") or request.args.get("since"))
+    response = Response(
+        stream_with_context(_stream_change_events(since)),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route('/api/hacker-news/changes', methods=['GET'])
+def hacker_news_changes():
+    """Long-poll for front page diffs after ``since``"""
+    since = _parse_feed_cursor(request.args.get("since"))
+    timeout = _parse_int_arg("timeout", default=25, minimum=0, maximum=MAX_LONG_POLL_TIMEOUT)
+    if since is not None:
+        events = change_feed.wait_for_events(since, timeout)
+        if events is not None:
+            version = events[-1]["version"] if events else since
+            return jsonify({
+                "status": "success",
+                "version": _feed_cursor(version),
+                "events": [_feed_event(e) for e in events],
+            })
+
+    # No version, one from another feed, or one older than the retained
+    # history: send a full snapshot
+    version, articles = change_feed.snapshot()
+    return jsonify({"status": "success", "version": _feed_cursor(version), "reset": True, "data": articles})
+
+
+@app.route('/api/hacker-news/<int:story_id>/comments', methods=['GET'])
+def hacker_news_comments(story_id):
+    """Fetch a story's comment tree"""
+    max_depth = _parse_int_arg("max_depth", default=10, minimum=1, maximum=MAX_COMMENT_DEPTH)
+    max_comments = _parse_int_arg("max_comments", default=500, minimum=1, maximum=MAX_COMMENTS)
+    try:
+        try:
+            story = comment_fetcher.get_item(story_id)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                abort(404)
+            raise
+        if request.args.get("stream") == "ndjson":
+            return Response(
+                stream_with_context(_stream_comments_ndjson(story, max_depth, max_comments)),
+                mimetype="application/x-ndjson",
+            )
+        comments, count, truncated = comment_fetcher.fetch_tree(story, max_depth, max_comments)
+    except requests.RequestException as e:
+        logging.error(f"Error fetching comments: {str(e)}")
+        return jsonify({
+            "error": "Bad Gateway",
+            "message": "Failed to fetch comments",
+        }), 502
+
+    return jsonify({
+        "status": "success",
+        "story": _format_story_item(story),
+        "count": count,
+        "truncated": truncated,
+        "comments": comments,
+    })
+
 
 @app.route('/hacker-news', methods=['GET'])
 def hacker_news_page():
     """Render the latest Hacker News stories"""
     try:
-        articles = _fetch_hacker_news()
-        return render_template('hacker_news.html', articles=articles)
+        articles, stored_at = _get_articles_entry()
     except requests.RequestException as e:
         logging.error(f"Error fetching Hacker News: {str(e)}")
         return render_template('error.html', message="Failed to fetch Hacker News"), 502
 
+    # Render once per article set; repeat hits are a dictionary lookup
+    payload = payload_cache.get(
+        ("hacker_news_page", stored_at),
+        lambda: render_template('hacker_news.html', articles=articles).encode(),
+        mimetype="text/html",
+    )
+    return payload_response(payload, _articles_cache_control(stored_at))
+
+
+@app.route('/api/stories', methods=['GET'])
+def stories_api():
+    """Query stored stories, newest first, with keyset pagination"""
+    author = request.args.get("author")
+    min_points = _parse_int_arg("min_points", minimum=0)
+    since = _parse_int_arg("since", minimum=0)
+    limit = _parse_int_arg("limit", default=50, minimum=1, maximum=MAX_STORIES_LIMIT)
+    try:
+        stories, next_cursor = _get_store().query_stories(
+            author=author,
+            min_points=min_points,
+            since=since,
+            cursor=request.args.get("cursor"),
+            limit=limit,
+        )
+    except ValueError:
+        abort(400)
+
+    data = []
+    for story in stories:
+        item = story.to_dict()
+        item["created_at"] = _format_date(item["created_at"])
+        data.append(item)
+    return jsonify({"status": "success", "count": len(data), "data": data, "next_cursor": next_cursor})
+
 
 # Get API information
 @app.route('/api/info', methods=['GET'])
 def api_info():
     """Get API information"""
-    return jsonify({
+    payload = payload_cache.get(("info",), lambda: _json_bytes({
         "name": "Hacker News API",
         "version": "1.0.0",
         "description": "Fetch front page Hacker News stories",
         "endpoints": {
             "health": "/api/health",
             "hacker_news": "/api/hacker-news",
+            "hacker_news_events": "/api/hacker-news/events",
+            "hacker_news_changes": "/api/hacker-news/changes",
+            "hacker_news_comments": "/api/hacker-news/<story_id>/comments",
             "info": "/api/info",
+            "stories": "/api/stories",
+            "cache_stats": "/api/cache-stats",
+            "metrics": "/api/metrics",
         },
-    })
+    }))
+    return payload_response(payload, "public, max-age=3600")
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report front page cache hit, miss and stale counts across all workers"""
+    totals = metrics.totals("hn_cache_events_total", "result")
+    return jsonify({result: totals.get(result, 0) for result in front_page_cache.stats()})
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose metrics in Prometheus text format"""
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.route('/api/debug-env', methods=['GET'])
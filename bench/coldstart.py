@@ -0,0 +1,96 @@
+"""Cold-start measurements: import time and first-request latency.
+
+Each run imports ``main`` in a fresh interpreter against a local fake
+Algolia server, then times the first ``/api/health`` request and the first
+and second ``/hacker-news`` requests. Prints the median of each as JSON.
+
+    python bench/coldstart.py --runs 5 [--build-dir build] [--snapshot-age 86400]
+
+Cold starts happen long after a deploy, so the build's snapshot is measured
+as ``--snapshot-age`` seconds old (default one day), not as just written.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "tests"))
+from fake_algolia import FakeAlgolia, make_hits  # noqa: E402
+
+# Runs inside the fresh interpreter
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+timings = {"import_ms": imported - started}
+for name, path in (("first_health_ms", "/api/health"), ("first_page_ms", "/hacker-news"),
+                   ("second_page_ms", "/hacker-news")):
+    started = time.perf_counter()
+    client.get(path)
+    timings[name] = time.perf_counter() - started
+print(json.dumps({k: round(v * 1000, 2) for k, v in timings.items()}))
+"""
+
+
+def measure(upstream_url, build_dir):
+    env = {
+        **os.environ,
+        "HN_API_URL": f"{upstream_url}/api/v1/search",
+        "HN_BUILD_DIR": build_dir,
+        "HN_USE_COMPILED_TEMPLATES": "1" if os.path.isdir(build_dir) else "0",
+        "DATABASE_URL": "sqlite://",
+        "LOG_LEVEL": "WARNING",
+    }
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def age_build(build_dir, target, age):
+    """Copy ``build_dir`` to ``target`` with its snapshot ``age`` seconds old"""
+    shutil.copytree(build_dir, target)
+    snapshot_path = os.path.join(target, "front_page.json")
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path) as f:
+            snapshot = json.load(f)
+        snapshot["fetched_at"] = int(time.time() - age)
+        with open(snapshot_path, "w") as f:
+            json.dump(snapshot, f)
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Algolia latency in seconds")
+    parser.add_argument(
+        "--build-dir", default=os.path.join(ROOT, "build", "missing"),
+        help="directory written by build.py (default: none, i.e. no precompiled templates or snapshot)",
+    )
+    parser.add_argument("--snapshot-age", type=float, default=86400, help="age in seconds given to the build's snapshot")
+    args = parser.parse_args(argv)
+
+    fake = FakeAlgolia(hits=make_hits(30), latency=args.latency).start()
+    tmp = tempfile.mkdtemp()
+    try:
+        build_dir = args.build_dir
+        if os.path.isdir(build_dir):
+            build_dir = age_build(build_dir, os.path.join(tmp, "build"), args.snapshot_age)
+        runs = [measure(fake.url, build_dir) for _ in range(args.runs)]
+    finally:
+        fake.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(json.dumps({key: statistics.median(r[key] for r in runs) for key in runs[0]}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Load and latency benchmarks for the app under gunicorn.
+
+Starts a local fake Algolia server, runs the app under gunicorn for each
+worker/thread combination, drives each endpoint at fixed request rates and
+writes throughput, latency percentiles, upstream call counts and RSS to a
+JSON file. Pass ``--compare`` with an earlier result file to check for
+regressions.
+
+    python bench/run.py --workers 1,2 --threads 1,4 --rates 50,200 --duration 10
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "tests"))
+from fake_algolia import FakeAlgolia, make_hits  # noqa: E402
+
+DEFAULT_ENDPOINTS = "/api/hacker-news,/hacker-news,/api/health"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree_rss_kb(pid):
+    """Total RSS of ``pid`` and its children, or None where /proc is unavailable"""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+    except OSError:
+        return None
+    return total
+
+
+class Server:
+    """The app running under gunicorn in a subprocess"""
+
+    def __init__(self, workers, threads, upstream_url, env=None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.cmd = [
+            sys.executable, "-m", "gunicorn",
+            "--workers", str(workers),
+            "--threads", str(threads),
+            "--bind", f"127.0.0.1:{self.port}",
+            "main:app",
+        ]
+        self.env = {
+            **os.environ,
+            "HN_API_URL": f"{upstream_url}/api/v1/search",
+            "HN_ITEMS_URL": f"{upstream_url}/api/v1/items",
+            "DATABASE_URL": "sqlite://",
+            **(env or {}),
+        }
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.cmd, cwd=ROOT, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                requests.get(self.url + "/api/health", timeout=1)
+                return self
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("gunicorn did not start within 30 seconds")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def drive(url, rate, duration, concurrency):
+    """Send requests at a fixed rate and return ``(latencies, errors, elapsed)``.
+
+    Latency is measured from each request's scheduled start, so a server that
+    falls behind is charged for the queueing delay it causes.
+    """
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(scheduled):
+        nonlocal errors
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            ok = session.get(url, timeout=30).status_code < 500
+        except requests.RequestException:
+            ok = False
+        latency = time.monotonic() - scheduled
+        with lock:
+            latencies.append(latency)
+            if not ok:
+                errors += 1
+
+    total = int(rate * duration)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, scheduled)
+    return latencies, errors, time.monotonic() - start
+
+
+def run(args):
+    fake = FakeAlgolia(
+        hits=make_hits(args.hits),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    ).start()
+    results = []
+    try:
+        for workers in args.workers:
+            for threads in args.threads:
+                with Server(workers, threads, fake.url) as server:
+                    for endpoint in args.endpoints:
+                        for rate in args.rates:
+                            upstream_before = fake.request_count
+                            latencies, errors, elapsed = drive(
+                                server.url + endpoint, rate, args.duration, args.concurrency
+                            )
+                            result = {
+                                "workers": workers,
+                                "threads": threads,
+                                "endpoint": endpoint,
+                                "rate": rate,
+                                "requests": len(latencies),
+                                "errors": errors,
+                                "throughput": round(len(latencies) / elapsed, 2),
+                                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                                "upstream_calls": fake.request_count - upstream_before,
+                                "rss_kb": process_tree_rss_kb(server.process.pid),
+                            }
+                            results.append(result)
+                            print(format_result(result), flush=True)
+    finally:
+        fake.stop()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "duration": args.duration,
+            "upstream": {
+                "hits": args.hits,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "error_rate": args.error_rate,
+            },
+        },
+        "results": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_result(r):
+    return (
+        f"w={r['workers']} t={r['threads']} {r['endpoint']} @{r['rate']}/s: "
+        f"{r['throughput']} req/s, p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, "
+        f"p99 {r['p99_ms']} ms, errors {r['errors']}, upstream {r['upstream_calls']}, "
+        f"rss {r['rss_kb']} kB"
+    )
+
+
+def result_key(r):
+    return (r["workers"], r["threads"], r["endpoint"], r["rate"])
+
+
+def compare_results(baseline, current, tolerance):
+    """Return descriptions of scenarios where ``current`` regressed past ``tolerance``"""
+    previous = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = previous.get(result_key(r))
+        if old is None:
+            continue
+        if r["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result_key(r)} p99 {old['p99_ms']} -> {r['p99_ms']} ms")
+        if r["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{result_key(r)} throughput {old['throughput']} -> {r['throughput']} req/s"
+            )
+        if r["errors"] > old["errors"]:
+            regressions.append(f"{result_key(r)} errors {old['errors']} -> {r['errors']}")
+    return regressions
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int_list, default=[1, 2])
+    parser.add_argument("--threads", type=int_list, default=[1, 4])
+    parser.add_argument("--rates", type=int_list, default=[50, 200])
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), default=DEFAULT_ENDPOINTS.split(","))
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=64, help="client threads")
+    parser.add_argument("--hits", type=int, default=30, help="hits per fake Algolia page")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Algolia latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failed upstream calls")
+    parser.add_argument("--output", help="result file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+
+    output = args.output or os.path.join(
+        ROOT, "bench", "results", time.strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
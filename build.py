@@ -0,0 +1,54 @@
+"""Build step for serverless deploys.
+
+Precompiles the Jinja templates into Python modules and snapshots the
+current front page, both under ``build/``. The app loads compiled templates
+from there, and a cold instance serves the snapshot while it refreshes.
+
+    python build.py [--no-snapshot]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from app import COMPILED_TEMPLATES_DIR, SNAPSHOT_PATH, _fetch_hacker_news, app
+
+
+def compile_templates(target=COMPILED_TEMPLATES_DIR):
+    """Compile every template with the app's Jinja settings into ``target``"""
+    # Compile from the source templates even if an older build is already loaded
+    env = app.jinja_env.overlay(loader=app.create_global_jinja_loader())
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    env.compile_templates(target, zip=None, ignore_errors=False)
+    return sorted(env.list_templates())
+
+
+def write_snapshot(path=SNAPSHOT_PATH):
+    """Fetch the front page and write it to ``path``"""
+    articles = _fetch_hacker_news()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fetched_at": int(time.time()), "articles": articles}, f)
+    os.replace(tmp, path)
+    return len(articles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-snapshot", action="store_true", help="skip the front page snapshot")
+    args = parser.parse_args(argv)
+
+    templates = compile_templates()
+    print(f"Compiled {len(templates)} templates into {COMPILED_TEMPLATES_DIR}")
+    if not args.no_snapshot:
+        count = write_snapshot()
+        print(f"Wrote {count} front page stories to {SNAPSHOT_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Cache backend that keeps up to ``maxsize`` entries in the current process"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """Cache backend stored in a SQLite file shared by all workers on a host.
+
+    Keeps the ``maxsize`` most recently stored entries.
+    """
+
+    def __init__(self, path, maxsize=256):
+        self.path = path
+        self.maxsize = maxsize
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def _connect(self):
+        # A short-lived connection per call keeps the backend thread-safe
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+            conn.execute(
+                "DELETE FROM cache WHERE key NOT IN "
+                "(SELECT key FROM cache ORDER BY stored_at DESC LIMIT ?)",
+                (self.maxsize,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+
+class StaleWhileRevalidateCache:
+    """Read-through cache with stale-while-revalidate and stale-if-error.
+
+    Entries younger than ``ttl`` are served directly. Entries up to
+    ``ttl + stale_ttl`` old are served while a single background refresh
+    runs. When a refresh fails, entries up to ``stale_if_error`` old are
+    served instead of raising. Concurrent loads of the same key within a
+    process share one call to the loader. ``observer``, if set, is called
+    with the result of every lookup: hits, misses, stale or errors.
+    """
+
+    def __init__(self, backend, ttl=60, stale_ttl=300, stale_if_error=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error = stale_if_error
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # key -> (stored_at, max_age) of seeded entries not yet refreshed
+        self._seeds = {}
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "errors": 0}
+        self.observer = None
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+        if self.observer is not None:
+            self.observer(name)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self._inflight.clear()
+            self._seeds.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def set(self, key, value):
+        """Store a freshly loaded value, e.g. from a background poller"""
+        self.backend.set(key, value, time.time())
+
+    def seed(self, key, value, stored_at, max_age):
+        """Store a prebuilt value, e.g. a build-time snapshot, at its real age.
+
+        Until it is replaced, a seed younger than ``max_age`` is served as
+        stale even past the stale window, so a cold process answers at once
+        and refreshes in the background.
+        """
+        self.backend.set(key, value, stored_at)
+        with self._lock:
+            self._seeds[key] = (stored_at, max_age)
+
+    def _is_seed(self, key, stored_at, age):
+        with self._lock:
+            seed = self._seeds.get(key)
+            if seed is None:
+                return False
+            if seed[0] != stored_at:
+                # Refreshed since it was seeded
+                del self._seeds[key]
+                return False
+            return age < seed[1]
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader`` as needed"""
+        return self.get_entry(key, loader)[0]
+
+    def get_entry(self, key, loader):
+        """Like ``get`` but return ``(value, stored_at)``.
+
+        ``stored_at`` changes whenever the value is reloaded, so callers can
+        use it as a version for work derived from the value.
+        """
+        entry = self.backend.get(key)
+        now = time.time()
+        if entry is not None:
+            age = now - entry[1]
+            if age < self.ttl:
+                self._count("hits")
+                return entry
+            if age < self.ttl + self.stale_ttl or self._is_seed(key, entry[1], age):
+                self._count("stale")
+                self._refresh_in_background(key, loader)
+                return entry
+
+        self._count("misses")
+        try:
+            return self._load(key, loader)
+        except Exception:
+            if entry is not None and now - entry[1] < self.stale_if_error:
+                self._count("errors")
+                logger.warning("Serving stale cache entry for %s after refresh failure", key)
+                return entry
+            raise
+
+    def _load(self, key, loader):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+        return self._run_load(key, loader, future)
+
+    def _run_load(self, key, loader, future):
+        """Call ``loader`` for ``key`` and resolve ``future``, registered in ``_inflight``"""
+        try:
+            entry = (loader(), time.time())
+            self.backend.set(key, *entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    def _refresh_in_background(self, key, loader):
+        # Register the load before starting the thread, so a burst of stale
+        # hits starts one refresh rather than one thread each
+        with self._lock:
+            if key in self._inflight:
+                return
+            future = self._inflight[key] = Future()
+
+        def refresh():
+            try:
+                self._run_load(key, loader, future)
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", key, e)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+def create_cache_from_env():
+    """Build the front page cache from HN_CACHE_* environment variables"""
+    backend_name = os.environ.get("HN_CACHE_BACKEND", "memory")
+    maxsize = int(os.environ.get("HN_CACHE_MAX_ENTRIES", "256"))
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(os.environ.get("HN_CACHE_PATH", "hn_cache.sqlite3"), maxsize=maxsize)
+    elif backend_name == "memory":
+        backend = MemoryBackend(maxsize=maxsize)
+    else:
+        raise ValueError(f"Unknown HN_CACHE_BACKEND: {backend_name}")
+
+    return StaleWhileRevalidateCache(
+        backend,
+        ttl=float(os.environ.get("HN_CACHE_TTL", "60")),
+        stale_ttl=float(os.environ.get("HN_CACHE_STALE_TTL", "300")),
+        stale_if_error=float(os.environ.get("HN_CACHE_STALE_IF_ERROR", "3600")),
+    )
@@ -0,0 +1,262 @@
+import fcntl
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def diff_stories(old, new):
+    """Compare two ``{id: article}`` snapshots of the front page"""
+    return {
+        "added": [new[i] for i in new if i not in old],
+        "removed": [i for i in old if i not in new],
+        "changed": [
+            {"id": i, "points": new[i].get("points"), "previous_points": old[i].get("points")}
+            for i in new
+            if i in old and new[i].get("points") != old[i].get("points")
+        ],
+    }
+
+
+class MemoryFeed:
+    """Change feed kept in the current process, for single-worker deployments.
+
+    ``epoch`` identifies this feed's version history, since every process
+    starts counting from 1.
+    """
+
+    def __init__(self, retention=1000):
+        self.epoch = secrets.token_hex(4)
+        self._events = deque(maxlen=retention)
+        self._version = 0
+        self._snapshot = []
+        self._condition = threading.Condition()
+
+    def publish(self, articles, diff):
+        with self._condition:
+            self._version += 1
+            self._snapshot = articles
+            self._events.append({"version": self._version, **diff})
+            self._condition.notify_all()
+            return self._version
+
+    def snapshot(self):
+        with self._condition:
+            return self._version, self._snapshot
+
+    def events_since(self, version):
+        """Return events after ``version``, or None if they are no longer retained"""
+        with self._condition:
+            if version == self._version:
+                return []
+            if version > self._version:
+                return None
+            if not self._events or self._events[0]["version"] > version + 1:
+                return None
+            return [e for e in self._events if e["version"] > version]
+
+    def wait_for_events(self, version, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != version, timeout)
+        return self.events_since(version)
+
+
+class SQLiteFeed:
+    """Change feed in a SQLite file so every gunicorn worker can serve it.
+
+    Other workers publish, so each process runs one watcher thread that
+    polls the file for new versions and wakes its subscribers, rather than
+    every subscriber polling on its own.
+    """
+
+    def __init__(self, path, retention=1000, poll_interval=0.5):
+        self.path = path
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._latest = None
+        self._watcher_pid = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_events ("
+                "version INTEGER PRIMARY KEY, diff TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_snapshot ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL, "
+                "articles TEXT NOT NULL)"
+            )
+            # Shared by every worker, and new if the file is recreated
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_epoch ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), epoch TEXT NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO feed_epoch (id, epoch) VALUES (1, ?)", (secrets.token_hex(4),)
+            )
+            self.epoch = conn.execute("SELECT epoch FROM feed_epoch").fetchone()[0]
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def publish(self, articles, diff):
+        with self._connect() as conn:
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM feed_events"
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO feed_events (version, diff) VALUES (?, ?)",
+                (version, json.dumps({"version": version, **diff})),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO feed_snapshot (id, version, articles) VALUES (1, ?, ?)",
+                (version, json.dumps(articles)),
+            )
+            conn.execute(
+                "DELETE FROM feed_events WHERE version <= ?", (version - self.retention,)
+            )
+        self._set_latest(version)
+        return version
+
+    def snapshot(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT version, articles FROM feed_snapshot").fetchone()
+        if row is None:
+            return 0, []
+        return row[0], json.loads(row[1])
+
+    def events_since(self, version):
+        """Return events after ``version``, or None if they are no longer retained"""
+        with self._connect() as conn:
+            oldest, latest = conn.execute(
+                "SELECT MIN(version), MAX(version) FROM feed_events"
+            ).fetchone()
+            latest = latest or 0
+            if version == latest:
+                return []
+            if version > latest or oldest > version + 1:
+                return None
+            rows = conn.execute(
+                "SELECT diff FROM feed_events WHERE version > ? ORDER BY version", (version,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _set_latest(self, latest):
+        with self._condition:
+            if latest != self._latest:
+                self._latest = latest
+                self._condition.notify_all()
+
+    def _start_watcher(self):
+        # Started on first use rather than at import, since threads do not survive a fork
+        with self._condition:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            self._latest = None
+        threading.Thread(target=self._watch, name="hn-feed-watcher", daemon=True).start()
+
+    def _watch(self):
+        conn = self._connect()
+        while True:
+            try:
+                latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM feed_events").fetchone()[0]
+                self._set_latest(latest)
+            except sqlite3.Error as e:
+                logger.warning("Change feed watcher failed to read %s: %s", self.path, e)
+            time.sleep(self.poll_interval)
+
+    def wait_for_events(self, version, timeout):
+        self._start_watcher()
+        with self._condition:
+            self._condition.wait_for(lambda: self._latest is not None and self._latest != version, timeout)
+            latest = self._latest
+        if latest == version:
+            return []
+        # Also covers a timeout before the watcher's first read
+        return self.events_since(version)
+
+
+class LeaderLock:
+    """Non-blocking file lock that makes one process on a host the leader"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class Poller:
+    """Refresh the front page on an interval and publish diffs to a feed.
+
+    ``fetch`` returns the current front page as a list of articles with an
+    ``id`` key. Only the process holding ``lock`` (if given) polls; the others
+    keep retrying so a new leader takes over if the current one exits.
+    """
+
+    def __init__(self, fetch, feed, interval=30, lock=None, on_refresh=None):
+        self.fetch = fetch
+        self.feed = feed
+        self.interval = interval
+        self.lock = lock
+        self.on_refresh = on_refresh
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="hn-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.lock is not None:
+            self.lock.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.lock is None or self.lock.acquire():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.warning("Front page poll failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def poll_once(self):
+        """Fetch the front page and publish a diff if anything changed"""
+        articles = self.fetch()
+        if self.on_refresh is not None:
+            self.on_refresh(articles)
+
+        version, previous = self.feed.snapshot()
+        old = {a["id"]: a for a in previous}
+        new = {a["id"]: a for a in articles}
+        diff = diff_stories(old, new)
+        if version and not any(diff.values()):
+            return version
+        return self.feed.publish(articles, diff)
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class ItemCache:
+    """LRU cache of Algolia items with a time-to-live"""
+
+    def __init__(self, maxsize=5000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, item_id):
+        with self._lock:
+            entry = self._items.get(item_id)
+            if entry is None:
+                return None
+            item, stored_at = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._items[item_id]
+                return None
+            self._items.move_to_end(item_id)
+            return item
+
+    def set(self, item_id, item):
+        with self._lock:
+            self._items[item_id] = (item, time.monotonic())
+            self._items.move_to_end(item_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class CommentTreeFetcher:
+    """Walk a story's comment tree from the Algolia items API.
+
+    The items API usually nests the whole tree under the story, so most
+    threads cost one upstream call. Children returned without their own
+    ``children`` are fetched level by level on a bounded thread pool.
+    """
+
+    def __init__(self, fetch_item, format_date, cache=None, max_workers=8):
+        self.fetch_item = fetch_item
+        self.format_date = format_date
+        self.cache = cache or ItemCache()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hn-items")
+
+    def get_item(self, item_id):
+        item = self.cache.get(item_id)
+        if item is None:
+            item = self.fetch_item(item_id)
+            self._cache_tree(item)
+        return item
+
+    def get_stub(self, item_id):
+        """Fetch a nested comment, returning None if it no longer exists"""
+        try:
+            return self.get_item(item_id)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def _cache_tree(self, item):
+        # Cache nested children too, so requests for a sub-thread are free
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            if "children" in node and node.get("id") is not None:
+                self.cache.set(node["id"], node)
+            stack.extend(node.get("children") or [])
+
+    def normalize(self, item, depth):
+        return {
+            "id": item.get("id"),
+            "parent_id": item.get("parent_id"),
+            "author": item.get("author"),
+            "text": item.get("text"),
+            "created_at": self.format_date(item.get("created_at")),
+            "depth": depth,
+        }
+
+    def walk(self, story, max_depth, max_comments):
+        """Return an iterable ``CommentWalk`` over the comments of ``story``"""
+        return CommentWalk(self, story, max_depth, max_comments)
+
+    def fetch_tree(self, story, max_depth, max_comments):
+        """Return ``(comments, count, truncated)`` with comments nested by parent"""
+        nodes = {}
+        roots = []
+        walk = self.walk(story, max_depth, max_comments)
+        for node in walk:
+            node["children"] = []
+            nodes[node["id"]] = node
+            parent = nodes.get(node["parent_id"])
+            (parent["children"] if parent is not None else roots).append(node)
+        return roots, len(nodes), walk.truncated
+
+
+class CommentWalk:
+    """Breadth-first walk over a story's comments.
+
+    ``story`` is the already fetched root item. Iteration stops after
+    ``max_comments`` comments or below ``max_depth`` levels, in which case
+    ``truncated`` is set once the walk is exhausted. Stubs that 404 are
+    skipped.
+    """
+
+    def __init__(self, fetcher, story, max_depth, max_comments):
+        self.fetcher = fetcher
+        self.story = story
+        self.max_depth = max_depth
+        self.max_comments = max_comments
+        self.truncated = False
+
+    def __iter__(self):
+        level = self.story.get("children") or []
+        depth = 1
+        count = 0
+        while level:
+            remaining = self.max_comments - count
+            if depth > self.max_depth or remaining <= 0:
+                self.truncated = True
+                return
+            if len(level) > remaining:
+                # Don't fetch stubs that would be cut off anyway
+                level = level[:remaining]
+                self.truncated = True
+
+            stub_ids = [child["id"] for child in level if "children" not in child]
+            fetched = dict(zip(stub_ids, self.fetcher.pool.map(self.fetcher.get_stub, stub_ids)))
+
+            next_level = []
+            for child in level:
+                item = fetched.get(child["id"], child)
+                if item is None:
+                    # Deleted since the parent was fetched
+                    continue
+                yield self.fetcher.normalize(item, depth)
+                count += 1
+                next_level.extend(item.get("children") or [])
+            if self.truncated:
+                return
+            level = next_level
+            depth += 1
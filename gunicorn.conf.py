@@ -0,0 +1,21 @@
+"""Gunicorn settings, loaded automatically when gunicorn starts in this directory.
+
+Keeps the shared metrics directory (HN_METRICS_DIR) in step with the
+workers: it is emptied when the master starts, and an exited worker's
+counters are folded into the dead-workers total.
+"""
+import os
+
+from instrumentation import Metrics, clear_metrics_directory
+
+
+def on_starting(server):
+    directory = os.environ.get("HN_METRICS_DIR")
+    if directory:
+        clear_metrics_directory(directory)
+
+
+def child_exit(server, worker):
+    directory = os.environ.get("HN_METRICS_DIR")
+    if directory:
+        Metrics(directory=directory).mark_process_dead(worker.pid)
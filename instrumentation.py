@@ -0,0 +1,333 @@
+import atexit
+import fcntl
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms of exited processes, summed
+DEAD_METRICS_FILE = "metrics-dead.json"
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, including ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Configure the root logger from LOG_LEVEL and LOG_FORMAT"""
+    handler = logging.StreamHandler()
+    if os.environ.get("LOG_FORMAT", "text") == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), handlers=[handler])
+
+
+class Metrics:
+    """Counters, gauges and histograms rendered in Prometheus text format.
+
+    With ``directory`` set, each process writes its values to
+    ``metrics-<pid>.json`` there from a background thread, at most
+    ``write_interval`` seconds after they change, and ``render`` sums the
+    files of all processes so any gunicorn worker can answer for the whole
+    server.
+    When a process has exited, its counters and histograms are folded into
+    ``metrics-dead.json`` and its file is removed, so totals never go down
+    when a new worker reuses its pid. Its gauges are dropped.
+    """
+
+    def __init__(self, directory=None, write_interval=1.0):
+        self.directory = directory
+        self.write_interval = write_interval
+        self._meta = {}
+        self._values = {"counter": {}, "gauge": {}, "histogram": {}}
+        self._lock = threading.Lock()
+        # Bumped on every update so the writer can skip unchanged snapshots
+        self._changes = 0
+        self._writer_pid = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def describe(self, name, kind, help, buckets=None):
+        self._meta[name] = {"type": kind, "help": help, "buckets": buckets}
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self._lock:
+            values = self._values["counter"]
+            values[key] = values.get(key, 0) + value
+            self._changes += 1
+
+    def gauge_add(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self._lock:
+            values = self._values["gauge"]
+            values[key] = values.get(key, 0) + value
+            self._changes += 1
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        buckets = self._meta[name]["buckets"]
+        with self._lock:
+            series = self._values["histogram"].get(key)
+            if series is None:
+                # Per-bucket counts, then the +Inf count and the sum
+                series = self._values["histogram"][key] = [0] * (len(buckets) + 1) + [0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(buckets)] += 1
+            series[-1] += value
+            self._changes += 1
+
+    @staticmethod
+    def _key(name, labels):
+        return json.dumps([name, sorted((labels or {}).items())])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counter": dict(self._values["counter"]),
+                "gauge": dict(self._values["gauge"]),
+                "histogram": {k: list(v) for k, v in self._values["histogram"].items()},
+            }
+
+    def start_writer(self):
+        """Start this process's snapshot writer, once per process.
+
+        Called on every request rather than at import, since threads do not
+        survive gunicorn forking its workers.
+        """
+        if not self.directory or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        # This process has not written yet, so a file with its pid is left over from an exited one
+        self.mark_process_dead(os.getpid())
+        threading.Thread(target=self._write_periodically, name="metrics-writer", daemon=True).start()
+        # Flush whatever the last interval collected when the worker exits
+        atexit.register(self.write)
+
+    def _write_periodically(self):
+        written = None
+        while True:
+            time.sleep(self.write_interval)
+            changes = self._changes
+            if changes == written:
+                continue
+            try:
+                self.write()
+                written = changes
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    def write(self):
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _directory_lock(self, mode):
+        """Hold a flock on the directory: exclusive to fold files, shared to read them"""
+        fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, mode)
+        return fd
+
+    def _unlock(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def mark_process_dead(self, pid):
+        """Fold an exited process's counters and histograms into the dead file and remove its file"""
+        path = os.path.join(self.directory, f"metrics-{pid}.json")
+        if not os.path.exists(path):
+            return
+        fd = self._directory_lock(fcntl.LOCK_EX)
+        try:
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                dead_path = os.path.join(self.directory, DEAD_METRICS_FILE)
+                dead = _read_snapshot(dead_path) or {"counter": {}, "gauge": {}, "histogram": {}}
+                merged = _merge([dead, {**snapshot, "gauge": {}}])
+                tmp = f"{dead_path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(merged, f)
+                os.replace(tmp, dead_path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        finally:
+            self._unlock(fd)
+
+    def _collect(self):
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = f"metrics-{os.getpid()}.json"
+            filenames = [
+                name for name in os.listdir(self.directory)
+                if name.startswith("metrics-") and name.endswith(".json") and name != own
+            ]
+            for filename in filenames:
+                pid = filename[len("metrics-"):-len(".json")]
+                if pid.isdigit() and not _pid_alive(int(pid)):
+                    self.mark_process_dead(int(pid))
+
+            # Read under the lock so no file is seen both before and after being folded
+            fd = self._directory_lock(fcntl.LOCK_SH)
+            try:
+                for filename in os.listdir(self.directory):
+                    if not filename.startswith("metrics-") or not filename.endswith(".json") or filename == own:
+                        continue
+                    snapshot = _read_snapshot(os.path.join(self.directory, filename))
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+            finally:
+                self._unlock(fd)
+        return _merge(snapshots)
+
+    def totals(self, name, label):
+        """Sum counter ``name`` across processes, grouped by the value of ``label``"""
+        totals = {}
+        for key, value in self._collect()["counter"].items():
+            series_name, labels = json.loads(key)
+            if series_name == name:
+                group = dict(labels).get(label)
+                totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def render(self):
+        """Return all metrics, summed across processes, in Prometheus text format"""
+        merged = self._collect()
+        series_by_name = {}
+        for kind, values in merged.items():
+            for key, value in values.items():
+                name, labels = json.loads(key)
+                series_by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, meta in self._meta.items():
+            lines.append(f"# HELP {name} {meta['help']}")
+            lines.append(f"# TYPE {name} {meta['type']}")
+            for labels, value in sorted(series_by_name.get(name, []), key=lambda s: s[0]):
+                if meta["type"] == "histogram":
+                    cumulative = 0
+                    bounds = [str(b) for b in meta["buckets"]] + ["+Inf"]
+                    for bound, count in zip(bounds, value):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + [['le', bound]])} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def clear_metrics_directory(directory):
+    """Remove every snapshot, e.g. when the gunicorn master starts"""
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith("metrics-") and (filename.endswith(".json") or filename.endswith(".tmp")):
+            os.remove(os.path.join(directory, filename))
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    merged = {"counter": {}, "gauge": {}, "histogram": {}}
+    for snapshot in snapshots:
+        for kind in ("counter", "gauge"):
+            for key, value in snapshot[kind].items():
+                merged[kind][key] = merged[kind].get(key, 0) + value
+        for key, series in snapshot["histogram"].items():
+            total = merged["histogram"].setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RequestProfiler:
+    """cProfile capture for a single request.
+
+    Only one request is profiled at a time: since Python 3.12 cProfile uses
+    process-wide monitoring hooks, so concurrent profiles would fail.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self._profile = None
+
+    def start(self):
+        if not self._lock.acquire(blocking=False):
+            return False
+        import cProfile
+
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def stop(self, limit=40):
+        """Stop profiling and return the top functions by cumulative time"""
+        self._profile.disable()
+        self._lock.release()
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,84 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+# Bodies are compressed on the request that first needs them, so favour
+# speed: brotli quality 5 is ~20x faster than the default 11 for ~5% more bytes
+BROTLI_QUALITY = 5
+
+
+class PreparedPayload:
+    """A serialized response body with its ETag and compressed variants"""
+
+    def __init__(self, body, mimetype="application/json"):
+        self.body = body
+        self.mimetype = mimetype
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": (body, digest)}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = (gzip.compress(body, compresslevel=6), f"{digest}-gzip")
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(body, quality=BROTLI_QUALITY), f"{digest}-br")
+
+    def select_encoding(self, accept_encodings):
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return "identity"
+
+
+class PayloadCache:
+    """Bounded LRU of prepared payloads keyed by content version"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build, mimetype="application/json"):
+        """Return the payload for ``key``, calling ``build()`` for the body on a miss"""
+        with self._lock:
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self._payloads.move_to_end(key)
+                return payload
+
+        payload = PreparedPayload(build(), mimetype)
+        with self._lock:
+            self._payloads[key] = payload
+            while len(self._payloads) > self.maxsize:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+
+
+def payload_response(payload, cache_control):
+    """Serve ``payload`` for the current request, honouring If-None-Match"""
+    encoding = payload.select_encoding(request.accept_encodings)
+    body, etag = payload.variants[encoding]
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=payload.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
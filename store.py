@@ -0,0 +1,219 @@
+import base64
+import time
+
+from sqlalchemy import Column, Index, Integer, String, Text, create_engine, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+Base = declarative_base()
+
+# Algolia does not page past this many hits of one query
+ALGOLIA_MAX_HITS = 1000
+
+# Thread-local session; the app removes it when each app context ends
+Session = scoped_session(sessionmaker())
+
+
+class Story(Base):
+    """A Hacker News story keyed by its Algolia ``objectID``"""
+
+    __tablename__ = "stories"
+
+    object_id = Column(String(32), primary_key=True)
+    title = Column(Text)
+    url = Column(Text)
+    author = Column(String(64), index=True)
+    points = Column(Integer, index=True)
+    num_comments = Column(Integer)
+    created_at = Column(String(32))
+    created_at_i = Column(Integer, nullable=False)
+    updated_at = Column(Integer, nullable=False)
+
+    # Matches the keyset pagination order used by query_stories
+    __table_args__ = (
+        Index("ix_stories_created_at_i_object_id", "created_at_i", "object_id"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.object_id,
+            "title": self.title,
+            "url": self.url,
+            "author": self.author,
+            "points": self.points,
+            "num_comments": self.num_comments,
+            "created_at": self.created_at,
+            "created_at_i": self.created_at_i,
+        }
+
+
+class SyncState(Base):
+    """Progress of the incremental sync for one set of Algolia tags.
+
+    ``watermark`` only advances once a pull has reached it, so a run that
+    fails or stops early leaves it in place for the next run.
+    """
+
+    __tablename__ = "sync_state"
+
+    tags = Column(String(64), primary_key=True)
+    watermark = Column(Integer, nullable=False)
+    # An unfinished pull: the newest story it saw, and the upper bound of the
+    # window it had moved on to
+    pending_newest = Column(Integer)
+    pending_before = Column(Integer)
+
+
+def init_store(database_url):
+    """Bind the session to ``database_url`` and create missing tables"""
+    options = {"pool_pre_ping": True}
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        # Share one in-memory database between threads
+        options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    engine = create_engine(database_url, **options)
+    Session.configure(bind=engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _hit_to_row(hit, now):
+    return {
+        "object_id": str(hit["objectID"]),
+        "title": hit.get("title") or hit.get("story_title"),
+        "url": hit.get("url") or hit.get("story_url"),
+        "author": hit.get("author"),
+        "points": hit.get("points"),
+        "num_comments": hit.get("num_comments"),
+        "created_at": hit.get("created_at"),
+        "created_at_i": hit.get("created_at_i") or 0,
+        "updated_at": now,
+    }
+
+
+def upsert_hits(hits):
+    """Insert or update Algolia hits by objectID, returning the row count"""
+    now = int(time.time())
+    rows = [_hit_to_row(h, now) for h in hits if h.get("objectID")]
+    if not rows:
+        return 0
+
+    dialect = Session.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql_insert(Story).values(rows)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(Story).values(rows)
+    else:
+        raise RuntimeError(f"Unsupported database dialect: {dialect}")
+
+    updated = {c: stmt.excluded[c] for c in rows[0] if c != "object_id"}
+    Session.execute(stmt.on_conflict_do_update(index_elements=["object_id"], set_=updated))
+    Session.commit()
+    return len(rows)
+
+
+def latest_created_at_i():
+    return Session.scalar(select(func.max(Story.created_at_i)))
+
+
+def sync_stories(fetch_json, tags="story", max_pages=10, hits_per_page=1000, lookback=86400):
+    """Pull stories newer than the last complete sync and upsert them.
+
+    ``fetch_json`` is called with Algolia ``search_by_date`` params, which
+    return the newest stories first and stop paging after
+    ``ALGOLIA_MAX_HITS``. The pull therefore walks backwards in
+    ``created_at_i`` windows until it reaches the watermark. A run that fails
+    or uses up ``max_pages`` requests is resumed by the next one. With no
+    previous sync, the watermark is the newest stored story, or ``lookback``
+    seconds ago for an empty store. Returns the number of stories written.
+    """
+    state = Session.get(SyncState, tags)
+    if state is None:
+        newest = latest_created_at_i()
+        if newest is None:
+            newest = int(time.time()) - lookback
+        state = SyncState(tags=tags, watermark=newest)
+        Session.add(state)
+        Session.commit()
+
+    written = 0
+    page = 0
+    oldest = None
+    for _ in range(max_pages):
+        # >= so stories sharing the watermark second are not missed; upserts are idempotent
+        numeric_filters = f"created_at_i>={state.watermark}"
+        if state.pending_before is not None:
+            numeric_filters += f",created_at_i<={state.pending_before}"
+        data = fetch_json({
+            "tags": tags,
+            "numericFilters": numeric_filters,
+            "hitsPerPage": hits_per_page,
+            "page": page,
+        })
+        hits = data.get("hits", [])
+        stamps = [h.get("created_at_i") or 0 for h in hits]
+        if stamps:
+            if state.pending_newest is None:
+                state.pending_newest = max(stamps)
+            oldest = min(stamps) if oldest is None else min(oldest, *stamps)
+        # Commits the pending state too
+        written += upsert_hits(hits)
+
+        if len(hits) < hits_per_page or (page + 1) * hits_per_page >= data.get("nbHits", 0):
+            # Reached the watermark: every story since it has been stored
+            if state.pending_newest is not None:
+                state.watermark = max(state.watermark, state.pending_newest)
+            state.pending_newest = state.pending_before = None
+            Session.commit()
+            return written
+
+        page += 1
+        if page * hits_per_page >= ALGOLIA_MAX_HITS:
+            # Continue below the oldest story seen; <= refetches ties, and a
+            # window that is all one second has to move past it
+            state.pending_before = oldest if oldest != state.pending_before else oldest - 1
+            Session.commit()
+            page, oldest = 0, None
+
+    Session.commit()
+    return written
+
+
+def encode_cursor(story):
+    raw = f"{story.created_at_i}:{story.object_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at_i, object_id)``, raising ValueError if malformed"""
+    try:
+        created_at_i, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        return int(created_at_i), object_id
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def query_stories(author=None, min_points=None, since=None, cursor=None, limit=50):
+    """Return ``(stories, next_cursor)`` newest first using keyset pagination"""
+    query = select(Story)
+    if author:
+        query = query.where(Story.author == author)
+    if min_points is not None:
+        query = query.where(Story.points >= min_points)
+    if since is not None:
+        query = query.where(Story.created_at_i >= since)
+    if cursor:
+        created_at_i, object_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Story.created_at_i < created_at_i,
+            (Story.created_at_i == created_at_i) & (Story.object_id < object_id),
+        ))
+
+    query = query.order_by(Story.created_at_i.desc(), Story.object_id.desc()).limit(limit + 1)
+    stories = Session.scalars(query).all()
+    next_cursor = None
+    if len(stories) > limit:
+        stories = stories[:limit]
+        next_cursor = encode_cursor(stories[-1])
+    return stories, next_cursor
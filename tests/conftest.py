@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(__file__))
+
+# Keep the story store in memory so tests never touch instance/stories.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+from fake_algolia import FakeAlgolia
+
+
+@pytest.fixture
+def fake_algolia():
+    server = FakeAlgolia().start()
+    yield server
+    server.stop()
@@ -0,0 +1,106 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeAlgolia:
+    """Local stand-in for the Algolia HN API with injectable latency and errors"""
+
+    def __init__(
+        self,
+        hits=None,
+        items=None,
+        latency=0.0,
+        jitter=0.0,
+        fail_times=0,
+        error_rate=0.0,
+        error_status=500,
+    ):
+        self.hits = hits if hits is not None else []
+        self.items = items if items is not None else {}
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_times = fail_times
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = fake._handle(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, path):
+        with self._lock:
+            self.request_count += 1
+            self.requests.append(path)
+            failing = self.fail_times > 0
+            if failing:
+                self.fail_times -= 1
+
+        failing = failing or (self.error_rate and random.random() < self.error_rate)
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if failing:
+            return self.error_status, {"message": "injected failure"}
+        if "/items/" in path:
+            item = self.items.get(path.rsplit("/", 1)[1])
+            if item is None:
+                return 404, {"message": "not found"}
+            return 200, item
+        return 200, {"hits": self.hits}
+
+
+def make_hits(count, title_size=80):
+    """Build ``count`` front-page-like hits for payload size experiments"""
+    now = int(time.time())
+    return [
+        {
+            "objectID": str(40000000 + i),
+            "title": f"Story {i} " + "x" * title_size,
+            "url": f"https://example.com/{i}",
+            "author": f"user{i % 50}",
+            "points": (i * 37) % 500,
+            "num_comments": i % 120,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(now - i * 60)),
+            "created_at_i": now - i * 60,
+        }
+        for i in range(count)
+    ]
@@ -1,14 +1,21 @@
+import gzip
+import json
 import os
 import sys
+import threading
+import time
 import pytest
 from unittest.mock import patch
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from app import app, _fetch_hacker_news
+import app as app_module
+from app import app, _fetch_hacker_news, front_page_cache, payload_cache
 
 
 @pytest.fixture
 def client():
+    front_page_cache.clear()
+    payload_cache.clear()
     return app.test_client()
 
 
@@ -39,30 +46,18 @@ def test_hacker_news_api_endpoint(client):
         assert data['data'] == mock_articles
 
 
-def test_fetch_hacker_news_formats_data():
-    sample_api_response = {
-        'hits': [
-            {
-                'title': 'Hello',
-                'url': 'https://example.com',
-                'author': 'abc',
-                'points': 1,
-                'created_at': '2023-01-01T00:00:00.000Z',
-            }
-        ]
-    }
-
-    class MockResponse:
-        def __init__(self, data):
-            self._data = data
-
-        def json(self):
-            return self._data
-
-        def raise_for_status(self):
-            pass
+def test_fetch_hacker_news_formats_data(fake_algolia):
+    fake_algolia.hits = [
+        {
+            'title': 'Hello',
+            'url': 'https://example.com',
+            'author': 'abc',
+            'points': 1,
+            'created_at': '2023-01-01T00:00:00.000Z',
+        }
+    ]
 
-    with patch('requests.get', return_value=MockResponse(sample_api_response)):
+    with patch('app.HN_API_URL', fake_algolia.url + '/api/v1/search'):
         articles = _fetch_hacker_news()
         assert articles == [
             {
@@ -73,3 +68,154 @@ def test_fetch_hacker_news_formats_data():
                 'created_at': '2023-01-01 00:00 UTC',
             }
         ]
+    assert fake_algolia.requests == ['/api/v1/search?tags=front_page']
+
+
+def test_hacker_news_api_serves_cached_articles(client):
+    mock_articles = [{'title': 'Cached'}]
+    # Counters are process-wide metrics, so compare against the starting values
+    before = client.get('/api/cache-stats').get_json()
+    with patch('app._fetch_hacker_news', return_value=mock_articles) as fetch:
+        client.get('/api/hacker-news')
+        resp = client.get('/api/hacker-news')
+        assert resp.get_json()['data'] == mock_articles
+        assert fetch.call_count == 1
+
+    stats = client.get('/api/cache-stats').get_json()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 1
+    assert 'hn_cache_events_total{result="hits"}' in client.get('/api/metrics').get_data(as_text=True)
+
+
+def test_hacker_news_api_fetches_multiple_pages(client, fake_algolia):
+    fake_algolia.hits = [{'title': 'Story', 'created_at': '2023-01-01T00:00:00.000Z'}]
+    with patch('app.HN_API_URL', fake_algolia.url + '/search'):
+        resp = client.get('/api/hacker-news?pages=3&hitsPerPage=50&created_after=100')
+    assert resp.status_code == 200
+    assert resp.get_json()['count'] == 3
+    assert sorted(fake_algolia.requests) == [
+        '/search?tags=front_page&hitsPerPage=50&numericFilters=created_at_i%3E100',
+        '/search?tags=front_page&hitsPerPage=50&numericFilters=created_at_i%3E100&page=1',
+        '/search?tags=front_page&hitsPerPage=50&numericFilters=created_at_i%3E100&page=2',
+    ]
+
+
+def test_hacker_news_api_rejects_invalid_pages(client):
+    assert client.get('/api/hacker-news?pages=0').status_code == 400
+    assert client.get('/api/hacker-news?pages=abc').status_code == 400
+
+
+def test_hacker_news_api_streams_ndjson(client, fake_algolia):
+    fake_algolia.hits = [{'title': 'One'}, {'title': 'Two'}]
+    with patch('app.HN_API_URL', fake_algolia.url + '/search'):
+        resp = client.get('/api/hacker-news?stream=ndjson&pages=2')
+        lines = resp.get_data(as_text=True).splitlines()
+    assert resp.mimetype == 'application/x-ndjson'
+    assert sorted(json.loads(line)['title'] for line in lines) == ['One', 'One', 'Two', 'Two']
+
+
+def test_ndjson_stream_keeps_page_order(client):
+    def fetch_page(params, page=0):
+        # Later pages finish first
+        time.sleep(0.05 * (2 - page))
+        return [{'title': f'Page {page}'}]
+
+    with patch('app._fetch_page', side_effect=fetch_page):
+        resp = client.get('/api/hacker-news?stream=ndjson&pages=3')
+        titles = [json.loads(line)['title'] for line in resp.get_data(as_text=True).splitlines()]
+    assert titles == ['Page 0', 'Page 1', 'Page 2']
+
+
+def test_hacker_news_api_conditional_get(client):
+    with patch('app._fetch_hacker_news', return_value=[{'title': 'Story'}]):
+        resp = client.get('/api/hacker-news')
+        etag = resp.headers['ETag']
+        assert 'Accept-Encoding' in resp.headers['Vary']
+        assert resp.headers['Cache-Control'].startswith('public, max-age=')
+
+        resp = client.get('/api/hacker-news', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
+        assert resp.headers['ETag'] == etag
+
+
+def test_hacker_news_api_serves_precompressed_body(client):
+    mock_articles = [{'title': f'Story {i}', 'url': 'https://example.com'} for i in range(50)]
+    with patch('app._fetch_hacker_news', return_value=mock_articles):
+        resp = client.get('/api/hacker-news', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(resp.data))['data'] == mock_articles
+
+
+def test_info_endpoint_is_cacheable(client):
+    resp = client.get('/api/info')
+    assert resp.get_json()['name'] == 'Hacker News API'
+    assert resp.headers['Cache-Control'] == 'public, max-age=3600'
+    resp = client.get('/api/info', headers={'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+
+
+def test_hacker_news_page_renders_once_per_article_set(client):
+    with patch('app._fetch_hacker_news', return_value=[{'title': 'Story'}]), \
+            patch('app.render_template', wraps=app_module.render_template) as render:
+        first = client.get('/hacker-news')
+        second = client.get('/hacker-news')
+    assert first.data == second.data
+    assert b'Story' in first.data
+    assert first.mimetype == 'text/html'
+    assert render.call_count == 1
+
+
+def test_snapshot_is_served_while_refreshing(client, tmp_path):
+    snapshot = tmp_path / 'front_page.json'
+    snapshot.write_text(json.dumps({'fetched_at': time.time() - 90, 'articles': [{'title': 'From snapshot'}]}))
+    refreshed = threading.Event()
+
+    def fetch(*args):
+        refreshed.set()
+        return [{'title': 'Fresh'}]
+
+    with patch('app.SNAPSHOT_PATH', str(snapshot)), patch('app._fetch_hacker_news', side_effect=fetch):
+        app_module._load_snapshot()
+        resp = client.get('/api/hacker-news')
+        assert resp.get_json()['data'] == [{'title': 'From snapshot'}]
+        assert 'max-age=0,' in resp.headers['Cache-Control']
+        assert refreshed.wait(2)
+
+
+def test_old_snapshot_is_served_while_refreshing(client, tmp_path):
+    cache = app_module.front_page_cache
+    snapshot = tmp_path / 'front_page.json'
+    fetched_at = time.time() - cache.ttl - cache.stale_ttl - cache.stale_if_error
+    snapshot.write_text(json.dumps({'fetched_at': fetched_at, 'articles': [{'title': 'From snapshot'}]}))
+    refreshed = threading.Event()
+    release = threading.Event()
+
+    def fetch(*args):
+        refreshed.set()
+        release.wait(2)
+        return [{'title': 'Fresh'}]
+
+    with patch('app.SNAPSHOT_PATH', str(snapshot)), patch('app._fetch_hacker_news', side_effect=fetch):
+        app_module._load_snapshot()
+        for _ in range(2):
+            resp = client.get('/api/hacker-news')
+            assert resp.get_json()['data'] == [{'title': 'From snapshot'}]
+            assert resp.headers['Cache-Control'] == 'public, max-age=0'
+        assert refreshed.wait(2)
+        release.set()
+        for _ in range(50):
+            if client.get('/api/hacker-news').get_json()['data'] == [{'title': 'Fresh'}]:
+                break
+            time.sleep(0.01)
+        assert client.get('/api/hacker-news').get_json()['data'] == [{'title': 'Fresh'}]
+
+
+def test_snapshot_past_max_age_is_ignored(client, tmp_path):
+    snapshot = tmp_path / 'front_page.json'
+    fetched_at = time.time() - app_module.SNAPSHOT_MAX_AGE - 1
+    snapshot.write_text(json.dumps({'fetched_at': fetched_at, 'articles': [{'title': 'From snapshot'}]}))
+
+    with patch('app.SNAPSHOT_PATH', str(snapshot)), patch('app._fetch_hacker_news', return_value=[{'title': 'Fresh'}]):
+        app_module._load_snapshot()
+        assert client.get('/api/hacker-news').get_json()['data'] == [{'title': 'Fresh'}]
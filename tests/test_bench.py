@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bench'))
+from run import compare_results, percentile
+
+
+def result(p99, throughput, errors=0):
+    return {
+        'workers': 1, 'threads': 1, 'endpoint': '/api/health', 'rate': 50,
+        'p99_ms': p99, 'throughput': throughput, 'errors': errors,
+    }
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([5], 99) == 5
+    assert percentile([], 50) is None
+
+
+def test_compare_results_flags_regressions():
+    baseline = {'results': [result(10, 50)]}
+    assert compare_results(baseline, {'results': [result(10.5, 49)]}, 0.1) == []
+    regressions = compare_results(baseline, {'results': [result(20, 30, errors=1)]}, 0.1)
+    assert len(regressions) == 3
@@ -0,0 +1,30 @@
+import os
+import sys
+
+from flask import Flask, render_template
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from app import _use_compiled_templates, app
+from build import compile_templates
+
+
+def test_compiled_templates_render_like_source(tmp_path):
+    templates = compile_templates(str(tmp_path))
+    assert 'hacker_news.html' in templates
+
+    compiled_app = Flask('app', root_path=app.root_path)
+    _use_compiled_templates(compiled_app, str(tmp_path))
+
+    articles = [{'title': '<script>', 'url': 'https://example.com', 'author': 'a', 'points': 1, 'created_at': ''}]
+    with app.test_request_context():
+        expected = render_template('hacker_news.html', articles=articles)
+    with compiled_app.test_request_context():
+        assert render_template('hacker_news.html', articles=articles) == expected
+        # Loaded from the compiled module, not the template source
+        assert compiled_app.jinja_env.get_template('hacker_news.html').filename.startswith(str(tmp_path))
+    assert '&lt;script&gt;' in expected
+
+
+def test_compiled_templates_are_opt_in():
+    # A stale local build must not hide edits to templates/
+    assert 'loader' not in app.jinja_options
@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from cache import MemoryBackend, SQLiteBackend, StaleWhileRevalidateCache
+
+
+def test_fresh_entries_are_served_from_cache():
+    cache = StaleWhileRevalidateCache(MemoryBackend(), ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return ['story']
+
+    assert cache.get('k', loader) == ['story']
+    assert cache.get('k', loader) == ['story']
+    assert len(calls) == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'stale': 0, 'errors': 0}
+
+
+def test_stale_entry_is_served_while_refreshing():
+    backend = MemoryBackend()
+    backend.set('k', ['old'], time.time() - 90)
+    cache = StaleWhileRevalidateCache(backend, ttl=60, stale_ttl=300)
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return ['new']
+
+    assert cache.get('k', loader) == ['old']
+    assert refreshed.wait(2)
+    for _ in range(50):
+        if backend.get('k')[0] == ['new']:
+            break
+        time.sleep(0.01)
+    assert backend.get('k')[0] == ['new']
+    assert cache.stats()['stale'] == 1
+
+
+def test_burst_of_stale_hits_refreshes_once():
+    backend = MemoryBackend()
+    backend.set('k', ['old'], time.time() - 90)
+    cache = StaleWhileRevalidateCache(backend, ttl=60, stale_ttl=300)
+    calls = []
+    started = []
+
+    # Hold the refresh threads until the burst is over, then run them in turn
+    with patch('cache.threading.Thread') as thread:
+        thread.side_effect = lambda target, **kwargs: started.append(target) or thread.return_value
+        for _ in range(20):
+            assert cache.get('k', lambda: calls.append(1) or ['new']) == ['old']
+    for target in started:
+        target()
+    assert len(calls) == 1
+    assert backend.get('k')[0] == ['new']
+
+
+def test_stale_if_error_falls_back_to_old_entry():
+    backend = MemoryBackend()
+    backend.set('k', ['old'], time.time() - 1000)
+    cache = StaleWhileRevalidateCache(backend, ttl=60, stale_ttl=300, stale_if_error=3600)
+
+    def loader():
+        raise RuntimeError('upstream down')
+
+    assert cache.get('k', loader) == ['old']
+    assert cache.stats()['errors'] == 1
+
+
+def test_miss_without_entry_raises_loader_error():
+    cache = StaleWhileRevalidateCache(MemoryBackend())
+
+    def loader():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.get('k', loader)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = StaleWhileRevalidateCache(MemoryBackend())
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return ['story']
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get('k', loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [['story']] * 8
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLiteBackend(path).set('k', [{'title': 'Hello'}], 123.0)
+    assert SQLiteBackend(path).get('k') == ([{'title': 'Hello'}], 123.0)
+
+
+def test_backends_are_bounded(tmp_path):
+    # Memory evicts the least recently used entry, SQLite the oldest stored one
+    for backend, evicted in ((MemoryBackend(maxsize=2), 'b'), (SQLiteBackend(str(tmp_path / 'c.sqlite3'), maxsize=2), 'a')):
+        backend.set('a', 1, 1.0)
+        backend.set('b', 2, 2.0)
+        backend.get('a')
+        backend.set('c', 3, 3.0)
+        assert backend.get(evicted) is None
+        assert backend.get('c') == (3, 3.0)
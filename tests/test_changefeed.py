@@ -0,0 +1,148 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from app import app
+from changefeed import LeaderLock, MemoryFeed, Poller, SQLiteFeed, diff_stories
+
+
+def article(id, points):
+    return {'id': id, 'title': f'Story {id}', 'points': points}
+
+
+def test_diff_stories():
+    old = {'1': article('1', 10), '2': article('2', 20)}
+    new = {'2': article('2', 25), '3': article('3', 5)}
+    assert diff_stories(old, new) == {
+        'added': [article('3', 5)],
+        'removed': ['1'],
+        'changed': [{'id': '2', 'points': 25, 'previous_points': 20}],
+    }
+
+
+def test_poller_publishes_only_changes():
+    feed = MemoryFeed()
+    front_page = [article('1', 10)]
+    warmed = []
+    poller = Poller(lambda: list(front_page), feed, on_refresh=warmed.append)
+
+    assert poller.poll_once() == 1
+    assert poller.poll_once() == 1
+    front_page.append(article('2', 1))
+    assert poller.poll_once() == 2
+    assert feed.events_since(1) == [
+        {'version': 2, 'added': [article('2', 1)], 'removed': [], 'changed': []}
+    ]
+    assert len(warmed) == 3
+
+
+def test_memory_feed_reports_gaps():
+    feed = MemoryFeed(retention=2)
+    for i in range(4):
+        feed.publish([], {'added': [i], 'removed': [], 'changed': []})
+    assert [e['version'] for e in feed.events_since(2)] == [3, 4]
+    assert feed.events_since(1) is None
+    assert feed.events_since(4) == []
+    assert feed.events_since(99) is None
+
+
+def test_memory_feed_wakes_waiters():
+    feed = MemoryFeed()
+    timer = threading.Timer(0.05, feed.publish, ([], {'added': [], 'removed': ['1'], 'changed': []}))
+    timer.start()
+    events = feed.wait_for_events(0, timeout=2)
+    assert [e['version'] for e in events] == [1]
+
+
+def test_sqlite_feed_is_shared(tmp_path):
+    path = str(tmp_path / 'feed.sqlite3')
+    SQLiteFeed(path).publish([article('1', 1)], {'added': [article('1', 1)], 'removed': [], 'changed': []})
+    reader = SQLiteFeed(path)
+    assert reader.epoch == SQLiteFeed(path).epoch
+    assert reader.snapshot() == (1, [article('1', 1)])
+    assert [e['version'] for e in reader.wait_for_events(0, timeout=0)] == [1]
+
+
+def test_sqlite_feed_subscribers_share_one_watcher(tmp_path):
+    path = str(tmp_path / 'feed.sqlite3')
+    writer, reader = SQLiteFeed(path), SQLiteFeed(path, poll_interval=0.01)
+    connects = []
+    connect = reader._connect
+    reader._connect = lambda: connects.append(1) or connect()
+
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(reader.wait_for_events(0, timeout=2))) for _ in range(5)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.1)
+    writer.publish([], {'added': [], 'removed': ['1'], 'changed': []})
+    for waiter in waiters:
+        waiter.join()
+
+    assert [[e['version'] for e in events] for events in results] == [[1]] * 5
+    # The watcher's connection plus one read per subscriber once something changed
+    assert len(connects) == 6
+
+
+def test_poller_defaults_to_shared_feed(tmp_path):
+    env = {**os.environ, 'HN_POLLER_ENABLED': '1', 'HN_FEED_PATH': str(tmp_path / 'feed.sqlite3')}
+    env.pop('HN_FEED_BACKEND', None)
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'import app; print(type(app.change_feed).__name__)'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, text=True,
+    )
+    assert output.split()[-1] == 'SQLiteFeed'
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'poller.lock')
+    leader, follower = LeaderLock(path), LeaderLock(path)
+    assert leader.acquire()
+    assert not follower.acquire()
+    leader.release()
+    assert follower.acquire()
+    follower.release()
+
+
+def test_changes_endpoint_long_polls():
+    feed = MemoryFeed()
+    feed.publish([article('1', 1)], {'added': [article('1', 1)], 'removed': [], 'changed': []})
+    client = app.test_client()
+    with patch('app.change_feed', feed):
+        data = client.get('/api/hacker-news/changes').get_json()
+        assert data['version'] == f'{feed.epoch}-1' and data['reset'] and data['data'] == [article('1', 1)]
+
+        timer = threading.Timer(0.05, feed.publish, ([], {'added': [], 'removed': ['1'], 'changed': []}))
+        timer.start()
+        data = client.get(f'/api/hacker-news/changes?since={feed.epoch}-1&timeout=5').get_json()
+        assert data['version'] == data['events'][0]['version'] == f'{feed.epoch}-2'
+        assert data['events'][0]['removed'] == ['1']
+
+
+def test_version_from_another_feed_gets_a_snapshot():
+    feed = MemoryFeed()
+    feed.publish([article('1', 1)], {'added': [article('1', 1)], 'removed': [], 'changed': []})
+    feed.publish([article('1', 2)], {'added': [], 'removed': [], 'changed': [{'id': '1', 'points': 2, 'previous_points': 1}]})
+    client = app.test_client()
+    with patch('app.change_feed', feed):
+        # Issued by another worker whose history happens to be shorter
+        data = client.get('/api/hacker-news/changes?since=0123abcd-1&timeout=0').get_json()
+        assert data['reset'] and data['version'] == f'{feed.epoch}-2'
+        assert client.get('/api/hacker-news/changes?since=1&timeout=0').get_json()['reset']
+
+
+def test_events_endpoint_streams_snapshot_then_diffs():
+    feed = MemoryFeed()
+    feed.publish([article('1', 1)], {'added': [article('1', 1)], 'removed': [], 'changed': []})
+    feed.publish([article('1', 2)], {'added': [], 'removed': [], 'changed': [{'id': '1', 'points': 2, 'previous_points': 1}]})
+    client = app.test_client()
+    with patch('app.change_feed', feed):
+        resp = client.get('/api/hacker-news/events', headers={'Last-Event-ID': f'{feed.epoch}-1'}, buffered=False)
+        assert resp.mimetype == 'text/event-stream'
+        chunk = next(iter(resp.response))
+        resp.close()
+    assert chunk.startswith(f'event: diff\nid: {feed.epoch}-2\n'.encode())
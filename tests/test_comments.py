@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from app import app, comment_fetcher
+from comments import ItemCache
+
+
+def comment(id, parent_id, children=None):
+    item = {
+        'id': id,
+        'parent_id': parent_id,
+        'author': f'user{id}',
+        'text': f'Comment {id}',
+        'created_at': '2023-01-01T00:00:00.000Z',
+    }
+    if children is not None:
+        item['children'] = children
+    return item
+
+
+@pytest.fixture
+def client(fake_algolia):
+    # Story 1 nests comment 2, whose reply 3 is only a stub fetched separately
+    fake_algolia.items = {
+        '1': {
+            'id': 1,
+            'title': 'Story',
+            'url': 'https://example.com',
+            'author': 'op',
+            'points': 10,
+            'created_at': '2023-01-01T00:00:00.000Z',
+            'children': [comment(2, 1, [{'id': 3}]), comment(4, 1, [])],
+        },
+        '3': comment(3, 2, [comment(5, 3, [])]),
+    }
+    comment_fetcher.cache.clear()
+    with patch('app.HN_ITEMS_URL', fake_algolia.url + '/api/v1/items'):
+        yield app.test_client()
+
+
+def test_comment_tree(client, fake_algolia):
+    data = client.get('/api/hacker-news/1/comments').get_json()
+    assert data['story']['title'] == 'Story'
+    assert data['count'] == 4
+    assert data['truncated'] is False
+    first = data['comments'][0]
+    assert first['created_at'] == '2023-01-01 00:00 UTC'
+    assert first['children'][0]['id'] == 3
+    assert first['children'][0]['children'][0] == {**comment(5, 3, []), 'created_at': '2023-01-01 00:00 UTC', 'depth': 3}
+    assert sorted(fake_algolia.requests) == ['/api/v1/items/1', '/api/v1/items/3']
+
+
+def test_comment_tree_is_cached(client, fake_algolia):
+    client.get('/api/hacker-news/1/comments')
+    client.get('/api/hacker-news/1/comments')
+    client.get('/api/hacker-news/3/comments')
+    assert fake_algolia.request_count == 2
+
+
+def test_comment_tree_limits(client, fake_algolia):
+    data = client.get('/api/hacker-news/1/comments?max_depth=1').get_json()
+    assert [c['id'] for c in data['comments']] == [2, 4]
+    assert data['truncated'] is True
+    assert fake_algolia.requests == ['/api/v1/items/1']
+
+    data = client.get('/api/hacker-news/1/comments?max_comments=1').get_json()
+    assert data['count'] == 1
+    assert data['truncated'] is True
+
+
+def test_comment_stream(client):
+    resp = client.get('/api/hacker-news/1/comments?stream=ndjson')
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [line['type'] for line in lines] == ['story', 'comment', 'comment', 'comment', 'comment', 'end']
+    assert [line['depth'] for line in lines[1:-1]] == [1, 1, 2, 3]
+    assert lines[-1] == {'type': 'end', 'count': 4, 'truncated': False}
+
+
+def test_missing_story_returns_404(client):
+    assert client.get('/api/hacker-news/999/comments').status_code == 404
+
+
+def test_missing_reply_is_skipped(client, fake_algolia):
+    del fake_algolia.items['3']
+    resp = client.get('/api/hacker-news/1/comments')
+    assert resp.status_code == 200
+    assert resp.get_json()['count'] == 2
+
+
+def test_item_cache_evicts_least_recently_used():
+    cache = ItemCache(maxsize=2, ttl=60)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    cache.get(1)
+    cache.set(3, 'c')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a'
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from app import app
+from instrumentation import JsonFormatter, Metrics, clear_metrics_directory
+
+
+def make_metrics(directory=None):
+    m = Metrics(directory=directory)
+    m.describe('requests_total', 'counter', 'Requests')
+    m.describe('in_flight', 'gauge', 'In flight')
+    m.describe('latency_seconds', 'histogram', 'Latency', (0.1, 1.0))
+    return m
+
+
+def test_render_prometheus_text():
+    m = make_metrics()
+    m.inc('requests_total', {'route': '/a'})
+    m.inc('requests_total', {'route': '/a'})
+    m.observe('latency_seconds', 0.05)
+    m.observe('latency_seconds', 5)
+    text = m.render()
+    assert 'requests_total{route="/a"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'latency_seconds_count 2' in text
+
+
+def test_metrics_are_summed_across_processes(tmp_path):
+    other = make_metrics()
+    other.inc('requests_total')
+    other.gauge_add('in_flight', value=3)
+    snapshot = other.snapshot()
+
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    (tmp_path / f'metrics-{os.getppid()}.json').write_text(json.dumps(snapshot))
+    (tmp_path / f'metrics-{dead.pid}.json').write_text(json.dumps(snapshot))
+
+    m = make_metrics(str(tmp_path))
+    m.inc('requests_total')
+    text = m.render()
+    assert 'requests_total 3' in text
+    assert 'in_flight 3' in text
+
+
+def test_idle_process_snapshot_catches_up(tmp_path):
+    m = Metrics(directory=str(tmp_path), write_interval=0.01)
+    m.describe('in_flight', 'gauge', 'In flight')
+    m.start_writer()
+    m.gauge_add('in_flight')
+    m.gauge_add('in_flight', value=-1)
+
+    path = tmp_path / f'metrics-{os.getpid()}.json'
+    gauges = None
+    deadline = time.monotonic() + 2
+    while gauges != [0] and time.monotonic() < deadline:
+        time.sleep(0.01)
+        if path.exists():
+            gauges = list(json.loads(path.read_text())['gauge'].values())
+    assert gauges == [0]
+
+
+def test_exited_workers_are_folded_into_dead_total(tmp_path):
+    old = make_metrics()
+    old.inc('requests_total', value=5)
+    old.gauge_add('in_flight')
+    # Left by an exited process whose pid this one now reuses
+    (tmp_path / f'metrics-{os.getpid()}.json').write_text(json.dumps(old.snapshot()))
+
+    m = make_metrics(str(tmp_path))
+    m.start_writer()
+    m.inc('requests_total')
+    m.write()
+    text = m.render()
+    assert 'requests_total 6' in text
+    assert 'in_flight 0' not in text and 'in_flight 1' not in text
+    assert json.loads((tmp_path / 'metrics-dead.json').read_text())['counter'] == old.snapshot()['counter']
+
+    clear_metrics_directory(str(tmp_path))
+    assert not any(name.endswith('.json') for name in os.listdir(tmp_path))
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'handled', (), None)
+    record.route = '/api/health'
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'handled'
+    assert entry['route'] == '/api/health'
+
+
+def test_metrics_endpoint_reports_requests():
+    client = app.test_client()
+    client.get('/api/health')
+    resp = client.get('/api/metrics')
+    assert resp.content_type.startswith('text/plain; version=0.0.4')
+    text = resp.get_data(as_text=True)
+    assert 'http_requests_total{method="GET",route="/api/health",status="200"}' in text
+    assert 'http_requests_in_flight 1' in text
+
+
+def test_profile_requires_token():
+    client = app.test_client()
+    with patch('app.HN_PROFILE_TOKEN', 'secret'):
+        resp = client.get('/api/info?profile=1')
+        assert resp.is_json
+
+        resp = client.get('/api/info?profile=1', headers={'X-Profile-Token': 'secret'})
+        assert resp.mimetype == 'text/plain'
+        assert resp.headers['X-Profiled-Status'] == '200'
+        assert 'function calls' in resp.get_data(as_text=True)
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from payloads import PayloadCache, PreparedPayload
+
+
+def test_small_bodies_are_not_compressed():
+    payload = PreparedPayload(b'{}')
+    assert list(payload.variants) == ['identity']
+
+
+def test_brotli_is_preferred_when_accepted():
+    pytest.importorskip('brotli')
+    payload = PreparedPayload(b'x' * 1024)
+    accept = parse_accept_header('gzip, br', Accept)
+    assert payload.select_encoding(accept) == 'br'
+    accept = parse_accept_header('gzip, br;q=0', Accept)
+    assert payload.select_encoding(accept) == 'gzip'
+
+
+def test_payload_cache_builds_once_per_key():
+    cache = PayloadCache(maxsize=1)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return b'{"a": 1}'
+
+    first = cache.get('v1', build)
+    assert cache.get('v1', build) is first
+    cache.get('v2', build)
+    cache.get('v1', build)
+    assert len(calls) == 3
@@ -0,0 +1,151 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import app as app_module
+from app import app, _sync_stories
+from sqlalchemy import func, select
+
+import store as store_module
+from store import Base, Session, Story, query_stories, sync_stories, upsert_hits
+
+
+def make_hit(object_id, created_at_i, author='abc', points=10):
+    return {
+        'objectID': str(object_id),
+        'title': f'Story {object_id}',
+        'url': f'https://example.com/{object_id}',
+        'author': author,
+        'points': points,
+        'created_at': '2023-01-01T00:00:00.000Z',
+        'created_at_i': created_at_i,
+    }
+
+
+@pytest.fixture
+def store():
+    with app.app_context():
+        app_module._get_store()
+        yield
+        Session.remove()
+        engine = Session.get_bind()
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+
+
+def story_count():
+    return Session.scalar(select(func.count()).select_from(Story))
+
+
+def test_upsert_updates_existing_story(store):
+    upsert_hits([make_hit(1, 100, points=5)])
+    upsert_hits([make_hit(1, 100, points=50)])
+    assert story_count() == 1
+    assert Session.get(Story, '1').points == 50
+
+
+def test_query_stories_paginates_by_keyset(store):
+    upsert_hits([make_hit(i, 100 + i // 2) for i in range(5)])
+
+    seen = []
+    cursor = None
+    while True:
+        stories, cursor = query_stories(cursor=cursor, limit=2)
+        seen.extend(s.object_id for s in stories)
+        if cursor is None:
+            break
+    assert seen == ['4', '3', '2', '1', '0']
+
+
+def test_query_stories_filters(store):
+    upsert_hits([
+        make_hit(1, 100, author='alice', points=5),
+        make_hit(2, 200, author='alice', points=50),
+        make_hit(3, 300, author='bob', points=500),
+    ])
+    stories, _ = query_stories(author='alice', min_points=10)
+    assert [s.object_id for s in stories] == ['2']
+    stories, _ = query_stories(since=200)
+    assert [s.object_id for s in stories] == ['3', '2']
+
+
+def test_sync_only_requests_newer_stories(store, fake_algolia):
+    upsert_hits([make_hit(1, 1000)])
+    fake_algolia.hits = [make_hit(2, 2000)]
+    with patch('app.HN_SYNC_URL', fake_algolia.url + '/search_by_date'):
+        assert _sync_stories() == 1
+    assert 'numericFilters=created_at_i%3E%3D1000' in fake_algolia.requests[0]
+    assert story_count() == 2
+
+
+def search_by_date(hits, fail_on=None):
+    """Minimal Algolia search_by_date over ``hits``, newest first and paging capped"""
+    calls = []
+
+    def fetch_json(params):
+        calls.append(params)
+        if fail_on is not None and len(calls) == fail_on:
+            raise requests.ConnectionError('upstream down')
+        matching = [h for h in hits if all(
+            h['created_at_i'] >= int(f[len('created_at_i>='):]) if '>=' in f
+            else h['created_at_i'] <= int(f[len('created_at_i<='):])
+            for f in params['numericFilters'].split(',')
+        )]
+        matching.sort(key=lambda h: -h['created_at_i'])
+        per_page, page = params['hitsPerPage'], params['page']
+        start = page * per_page
+        if start >= store_module.ALGOLIA_MAX_HITS:
+            return {'hits': [], 'nbHits': len(matching)}
+        return {'hits': matching[start:start + per_page], 'nbHits': len(matching)}
+
+    fetch_json.calls = calls
+    return fetch_json
+
+
+def test_sync_walks_past_pagination_limit(store):
+    upsert_hits([make_hit(0, 1000)])
+    hits = [make_hit(i, 1000 + i) for i in range(1, 26)]
+    fetch_json = search_by_date(hits)
+
+    with patch.object(store_module, 'ALGOLIA_MAX_HITS', 10):
+        assert sync_stories(fetch_json, max_pages=20, hits_per_page=5) >= 25
+    assert story_count() == 26
+    assert 'created_at_i<=' in fetch_json.calls[-1]['numericFilters']
+
+
+def test_failed_sync_does_not_skip_older_stories(store):
+    upsert_hits([make_hit(0, 1000)])
+    hits = [make_hit(i, 1000 + i) for i in range(1, 21)]
+
+    with pytest.raises(requests.ConnectionError):
+        sync_stories(search_by_date(hits, fail_on=2), hits_per_page=5)
+    assert story_count() == 6
+
+    fetch_json = search_by_date(hits)
+    sync_stories(fetch_json, hits_per_page=5)
+    assert fetch_json.calls[0]['numericFilters'] == 'created_at_i>=1000'
+    assert story_count() == 21
+
+    # Only a complete pull moves the watermark
+    fetch_json = search_by_date(hits)
+    sync_stories(fetch_json, hits_per_page=5)
+    assert fetch_json.calls[0]['numericFilters'] == 'created_at_i>=1020'
+
+
+def test_stories_endpoint(store):
+    upsert_hits([make_hit(1, 100), make_hit(2, 200)])
+    client = app.test_client()
+
+    resp = client.get('/api/stories?limit=1')
+    data = resp.get_json()
+    assert [s['id'] for s in data['data']] == ['2']
+    assert data['data'][0]['created_at'] == '2023-01-01 00:00 UTC'
+
+    resp = client.get('/api/stories?limit=1&cursor=' + data['next_cursor'])
+    assert [s['id'] for s in resp.get_json()['data']] == ['1']
+
+    assert client.get('/api/stories?cursor=not-a-cursor').status_code == 400
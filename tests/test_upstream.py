@@ -0,0 +1,105 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from upstream import (
+    BulkheadFullError,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    UpstreamClient,
+)
+
+
+def make_client(**kwargs):
+    kwargs.setdefault('backoff', 0)
+    return UpstreamClient(**kwargs)
+
+
+def test_retries_transient_errors(fake_algolia):
+    fake_algolia.hits = [{'title': 'Hello'}]
+    fake_algolia.fail_times = 2
+    client = make_client(max_retries=2)
+
+    assert client.get_json(fake_algolia.url) == {'hits': [{'title': 'Hello'}]}
+    assert fake_algolia.request_count == 3
+
+
+def test_connections_are_reused(fake_algolia):
+    client = make_client()
+    client.get_json(fake_algolia.url)
+    session = client.session
+    client.get_json(fake_algolia.url)
+    assert client.session is session
+
+
+def test_read_timeout_raises(fake_algolia):
+    fake_algolia.latency = 0.5
+    client = make_client(read_timeout=0.1, max_retries=0)
+
+    with pytest.raises(requests.Timeout):
+        client.get(fake_algolia.url)
+
+
+def test_retry_budget_limits_retries(fake_algolia):
+    fake_algolia.fail_times = 100
+    client = make_client(max_retries=5, retry_budget=RetryBudget(ratio=0, min_tokens=1))
+
+    with pytest.raises(requests.HTTPError):
+        client.get(fake_algolia.url)
+    assert fake_algolia.request_count == 2
+
+
+def test_circuit_breaker_fails_fast(fake_algolia):
+    fake_algolia.fail_times = 100
+    client = make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get(fake_algolia.url)
+    with pytest.raises(CircuitOpenError):
+        client.get(fake_algolia.url)
+    assert fake_algolia.request_count == 2
+
+
+def test_circuit_breaker_closes_after_successful_trial(fake_algolia):
+    fake_algolia.fail_times = 1
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client = make_client(max_retries=0, breaker=breaker)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(fake_algolia.url)
+    client.get(fake_algolia.url)
+    assert breaker.state == 'closed'
+
+
+def test_bulkhead_rejects_when_full(fake_algolia):
+    client = make_client(max_concurrency=1, bulkhead_timeout=0.01)
+    client._bulkhead.acquire()
+    try:
+        with pytest.raises(BulkheadFullError):
+            client.get(fake_algolia.url)
+    finally:
+        client._bulkhead.release()
+    assert fake_algolia.request_count == 0
+
+
+def test_bulkhead_rejection_does_not_hold_half_open_trial(fake_algolia):
+    fake_algolia.fail_times = 1
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client = make_client(max_retries=0, breaker=breaker, max_concurrency=1, bulkhead_timeout=0.01)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(fake_algolia.url)
+    client._bulkhead.acquire()
+    try:
+        with pytest.raises(BulkheadFullError):
+            client.get(fake_algolia.url)
+    finally:
+        client._bulkhead.release()
+
+    client.get(fake_algolia.url)
+    assert breaker.state == 'closed'
@@ -0,0 +1,221 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class BulkheadFullError(requests.RequestException):
+    """Raised when too many outbound calls are already in flight"""
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of overall traffic.
+
+    Every request deposits ``ratio`` tokens and every retry spends one, so a
+    failing upstream sees at most ``1 + ratio`` times the normal call rate.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=3.0):
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 10.0)
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Fail fast after ``failure_threshold`` consecutive upstream failures.
+
+    After ``reset_timeout`` seconds one trial call is let through; success
+    closes the circuit again and failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """Pooled HTTP client with retries, a circuit breaker and a bulkhead"""
+
+    def __init__(
+        self,
+        connect_timeout=3.05,
+        read_timeout=5.0,
+        pool_size=10,
+        max_retries=2,
+        backoff=0.2,
+        max_backoff=2.0,
+        retry_budget=None,
+        breaker=None,
+        max_concurrency=10,
+        bulkhead_timeout=1.0,
+        observer=None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead_timeout = bulkhead_timeout
+        # Called as observer(url, outcome, seconds) after every attempt, where
+        # outcome is the status code or the exception class name
+        self.observer = observer
+        self._bulkhead = threading.BoundedSemaphore(max_concurrency)
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Keep-alive session owned by the current process"""
+        # Sockets must not be shared with forked gunicorn workers
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._session_lock:
+                if self._session is None or self._session_pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_size,
+                        pool_maxsize=self.pool_size,
+                        max_retries=0,
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter spreads retries from many workers over the window
+        cap = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(random.uniform(0, cap))
+
+    def _observe(self, url, outcome, started):
+        if self.observer is not None:
+            self.observer(url, outcome, time.perf_counter() - started)
+
+    def get(self, url, params=None):
+        """GET ``url`` and return the response, raising on failure"""
+        # Take a slot before asking the breaker, so a half-open trial is only
+        # granted to a call that will actually run and report its outcome
+        if not self._bulkhead.acquire(timeout=self.bulkhead_timeout):
+            raise BulkheadFullError(f"Too many concurrent requests to {url}")
+
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {url}")
+
+            self.retry_budget.deposit()
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                    self._observe(url, str(response.status_code), started)
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                except requests.RequestException as e:
+                    if getattr(e, "response", None) is None:
+                        self._observe(url, type(e).__name__, started)
+                    retryable = isinstance(
+                        e, (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+                    )
+                    if retryable and attempt < self.max_retries and self.retry_budget.withdraw():
+                        logger.warning("Retrying %s after error: %s", url, e)
+                        self._sleep_before_retry(attempt)
+                        attempt += 1
+                        continue
+                    self.breaker.record_failure()
+                    raise
+
+                self.breaker.record_success()
+                response.raise_for_status()
+                return response
+        finally:
+            self._bulkhead.release()
+
+    def get_json(self, url, params=None):
+        return self.get(url, params=params).json()
+
+
+def create_client_from_env():
+    """Build the upstream client from HN_HTTP_* environment variables"""
+    return UpstreamClient(
+        connect_timeout=float(os.environ.get("HN_HTTP_CONNECT_TIMEOUT", "3.05")),
+        read_timeout=float(os.environ.get("HN_HTTP_READ_TIMEOUT", "5")),
+        pool_size=int(os.environ.get("HN_HTTP_POOL_SIZE", "10")),
+        max_retries=int(os.environ.get("HN_HTTP_MAX_RETRIES", "2")),
+        backoff=float(os.environ.get("HN_HTTP_RETRY_BACKOFF", "0.2")),
+        retry_budget=RetryBudget(
+            ratio=float(os.environ.get("HN_HTTP_RETRY_BUDGET", "0.2")),
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.environ.get("HN_HTTP_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.environ.get("HN_HTTP_BREAKER_RESET", "30")),
+        ),
+        max_concurrency=int(os.environ.get("HN_HTTP_MAX_CONCURRENCY", "10")),
+        bulkhead_timeout=float(os.environ.get("HN_HTTP_BULKHEAD_TIMEOUT", "1")),
+    )